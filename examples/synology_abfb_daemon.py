@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# Copyright 2022, Nice Guy IT, LLC. All rights reserved.
+# SPDX-License-Identifier: MIT
+# Source: https://github.com/NiceGuyIT/synology_abfb_log_parser
+"""
+This script runs the "synology_abfb_log_parser" daemon. The daemon keeps the log entries of the last few days in memory
+and answers the searches of the TRMM scripts over a Unix socket (a named pipe on Windows). The scripts search the log
+entries with the daemon if it is running and load the log files themselves if it is not, so the daemon is optional.
+
+Start the daemon when the computer starts, e.g. with a scheduled task or a systemd service. The TRMM scripts can only
+search as far back as --after-days.
+    --after-days=7 -> Keep the log entries of the past 7 days.
+
+The daemon and the TRMM scripts share a secret key in --authkey-file. The daemon creates the key file if it does not
+exist. Run the daemon as root (SYSTEM on Windows), like the TRMM scripts, so other users can't read the key or take the
+socket. The TRMM scripts only use the daemon with --use-daemon.
+
+Stop the daemon with --stop.
+
+$ python3 synology_abfb_daemon.py --help
+usage: synology_abfb_daemon.py [-h] [--log-level {debug,info,warning,error,critical}]
+                               [--log-path LOG_PATH] [--log-glob LOG_GLOB]
+                               [--after-days AFTER_DAYS] [--address ADDRESS]
+                               [--authkey-file AUTHKEY_FILE] [--stop]
+
+Serve the Synology Active Backup for Business logs.
+
+optional arguments:
+  -h, --help            show this help message and exit
+  --log-level {debug,info,warning,error,critical}
+                        set log level for the Synology Active Backup for
+                        Business module
+  --log-path LOG_PATH   path to the Synology log files
+  --log-glob LOG_GLOB   filename glob for the log files
+  --after-days AFTER_DAYS
+                        number of days of log entries to keep
+  --address ADDRESS     address to listen on
+  --authkey-file AUTHKEY_FILE
+                        file with the key shared with the clients
+  --stop                stop the running daemon
+
+"""
+import argparse
+import datetime
+import logging
+import multiprocessing
+
+# Import the local copy for debugging purposes.
+# import sys
+# sys.path.append('/home/dev/projects/niceguyit/synology_abfb_log_parser/src')
+from synology_abfb_log_parser import abfb_daemon
+
+
+# Main entrance here...
+if __name__ == '__main__':
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description='Serve the Synology Active Backup for Business logs.')
+    parser.add_argument('--log-level', default='info', dest='log_level',
+                        choices=['debug', 'info', 'warning', 'error', 'critical'],
+                        help='set log level for the Synology Active Backup for Business module')
+    parser.add_argument('--log-path', default='', type=str,
+                        help='path to the Synology log files')
+    parser.add_argument('--log-glob', default='log.txt*', type=str,
+                        help='filename glob for the log files')
+    parser.add_argument('--after-days', default=7, type=float,
+                        help='number of days of log entries to keep')
+    parser.add_argument('--address', default=abfb_daemon.DEFAULT_ADDRESS, type=str,
+                        help='address to listen on')
+    parser.add_argument('--authkey-file', default=abfb_daemon.DEFAULT_AUTHKEY_FILE, type=str,
+                        help='file with the key shared with the clients')
+    parser.add_argument('--stop', default=False, action='store_true',
+                        help='stop the running daemon')
+    args = parser.parse_args()
+
+    log_format = '%(asctime)s %(funcName)s(%(lineno)d): %(message)s'
+    logging.basicConfig(format=log_format, level=args.log_level.upper())
+    top_logger = logging.getLogger()
+
+    if args.stop:
+        try:
+            abfb_daemon.request({'op': 'stop'}, address=args.address, authkey_file=args.authkey_file)
+        except (OSError, EOFError, ValueError, multiprocessing.AuthenticationError) as err:
+            top_logger.error(f'The daemon is not running: {err}')
+            exit(1)
+        exit(0)
+
+    abfb_daemon.LogDaemon(
+        after=datetime.timedelta(days=args.after_days),
+        log_path=args.log_path,
+        filename_glob=args.log_glob,
+        logger=top_logger,
+        address=args.address,
+        authkey_file=args.authkey_file,
+    ).serve_forever()
@@ -33,7 +33,7 @@ usage: trmm-synology_abfb_backup_days_ago.py [-h]
                                              [--ago-unit AGO_UNIT]
                                              [--ago-value AGO_VALUE]
                                              [--complete-days-ago COMPLETE_DAYS_AGO]
-                                             [--auto-upgrade]
+                                             [--use-daemon] [--auto-upgrade]
 
 Parse the Synology Active Backup for Business logs.
 
@@ -50,6 +50,8 @@ optional arguments:
                         time span value
   --complete-days-ago COMPLETE_DAYS_AGO
                         days ago that a complete backup indicates failure
+  --use-daemon          search with the synology_abfb_daemon.py example if it
+                        is running
   --auto-upgrade        auto-upgrade the synology_abfb_log_parser module
 
 """
@@ -107,7 +109,8 @@ except ModuleNotFoundError:
         import synology_abfb_log_parser
 
 
-def main(logger=logging.getLogger(), ago_unit='days', ago_value=1, log_path=None, log_glob='log.txt*', complete_days_ago=3):
+def main(logger=logging.getLogger(), ago_unit='days', ago_value=1, log_path=None, log_glob='log.txt*', complete_days_ago=3,
+         use_daemon=False):
     """
     Main program
     :param logger: logging instance of the root logger
@@ -118,34 +121,11 @@ def main(logger=logging.getLogger(), ago_unit='days', ago_value=1, log_path=None
     :param log_path: string Path to the log files.
     :param log_glob: string Filename glob for the log files. Defaults to 'log.txt*'
     :param complete_days_ago: int Days ago that a complete backup log does not exist indicates a failure
+    :param use_daemon: bool Search with the synology_abfb_daemon.py example if it is running
     :return: None
     """
     after = datetime.timedelta(**{ago_unit: ago_value})
 
-    # Since the package was imported, the syntax is package.subpackage.Class()
-    synology = synology_abfb_log_parser.abfb_log_parser.ActiveBackupLogParser(
-        # Search logs within the period specified.
-        # timedelta() will be off by 1 minute because 1 minute is added to detect if the log entry is last year vs.
-        # this year. This should be negligible.
-        after=after,
-
-        # Use different log location
-        log_path=log_path,
-
-        # Use different filename globbing
-        filename_glob=log_glob,
-
-        # Pass the logger
-        logger=logger
-    )
-
-    # Load the log entries
-    if log_path:
-        logger.debug(f'Loading log files in "{log_path}"')
-    else:
-        logger.debug(f'Loading log files in the default location')
-    synology.load()
-
     # Search for entries that match the criteria.
     find = {
         'method_name': 'server-requester.cpp',
@@ -157,8 +137,39 @@ def main(logger=logging.getLogger(), ago_unit='days', ago_value=1, log_path=None
             }
         },
     }
-    logger.debug('Searching the log files')
-    found = synology.search(find=find)
+
+    if use_daemon:
+        # Search with the daemon if it is running. Otherwise, load the log files in this process.
+        from synology_abfb_log_parser import abfb_daemon
+        logger.debug('Searching the log files with the daemon')
+        found = abfb_daemon.search(find=find, after=after, log_path=log_path, filename_glob=log_glob, logger=logger)
+    else:
+        # Since the package was imported, the syntax is package.subpackage.Class()
+        synology = synology_abfb_log_parser.abfb_log_parser.ActiveBackupLogParser(
+            # Search logs within the period specified.
+            # timedelta() will be off by 1 minute because 1 minute is added to detect if the log entry is last year vs.
+            # this year. This should be negligible.
+            after=after,
+
+            # Use different log location
+            log_path=log_path,
+
+            # Use different filename globbing
+            filename_glob=log_glob,
+
+            # Pass the logger
+            logger=logger
+        )
+
+        # Load the log entries
+        if log_path:
+            logger.debug(f'Loading log files in "{log_path}"')
+        else:
+            logger.debug(f'Loading log files in the default location')
+        synology.load()
+
+        logger.debug('Searching the log files')
+        found = synology.search(find=find)
     ts = (datetime.datetime.now() - after).strftime('%Y-%m-%d %X')
     if not found:
         logger.info(f"No log entries found since {ts}")
@@ -233,6 +244,8 @@ if __name__ == '__main__':
                         help='time span value')
     parser.add_argument('--complete-days-ago', default='3', type=int,
                         help='days ago that a complete backup indicates failure')
+    parser.add_argument('--use-daemon', default=False, action='store_true',
+                        help='search with the synology_abfb_daemon.py example if it is running')
     parser.add_argument('--auto-upgrade', default=False, action='store_true',
                         help='auto-upgrade the synology_abfb_log_parser module')
     args = parser.parse_args()
@@ -261,4 +274,5 @@ if __name__ == '__main__':
         'ago_unit': args.ago_unit,
         'ago_value': args.ago_value,
         'complete_days_ago': args.complete_days_ago,
+        'use_daemon': args.use_daemon,
     })
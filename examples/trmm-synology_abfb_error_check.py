@@ -26,6 +26,17 @@ using the --ago-unit and --ago-value parameters.
     --ago-unit=days --ago-value=7 -> Search the logs for the past 7 days.
     --ago-unit=weeks --ago-value=1 -> Same as above. Search the logs for the past 1 week.
 
+Use --checkpoint-file to only check the log entries written since the last run. The read position in each log file is
+saved in the checkpoint file, so a check that runs every few minutes only reads the new log entries.
+    --checkpoint-file=C:\\ProgramData\\TacticalRMM\\abfb_error_check.json
+
+Use --use-daemon to search the log entries with the synology_abfb_daemon.py example instead of loading the log files,
+which is much faster. The log files are loaded as usual if the daemon is not running or its key file can't be read.
+The daemon does not keep checkpoints, so --use-daemon is ignored with --checkpoint-file.
+
+Use --follow to keep running and print the ERRORs as they are written to the log, like 'tail -f'. Log rotation is
+handled. Stop it with Ctrl-C. This is for running the script by hand, not as a TRMM check.
+
 $ python3 trmm-synology_abfb_error_check.py --help
 usage: trmm-synology_abfb_error_check.py [-h]
                                          [--log-level {debug,info,warning,error,critical}]
@@ -33,6 +44,8 @@ usage: trmm-synology_abfb_error_check.py [-h]
                                          [--log-glob LOG_GLOB]
                                          [--ago-unit AGO_UNIT]
                                          [--ago-value AGO_VALUE]
+                                         [--checkpoint-file CHECKPOINT_FILE]
+                                         [--follow] [--use-daemon]
                                          [--auto-upgrade]
 
 Parse the Synology Active Backup for Business logs.
@@ -48,6 +61,12 @@ optional arguments:
                         weeks]
   --ago-value AGO_VALUE
                         time span value
+  --checkpoint-file CHECKPOINT_FILE
+                        file to save the read position in to only check new
+                        log entries
+  --follow              keep running and print the ERRORs as they are written
+  --use-daemon          search with the synology_abfb_daemon.py example if it
+                        is running
   --auto-upgrade        auto-upgrade the synology_abfb_log_parser module
 
 """
@@ -105,7 +124,8 @@ except ModuleNotFoundError:
         # import synology_abfb_log_parser
 
 
-def main(logger=logging.getLogger(), ago_unit='days', ago_value=1, log_path=None, log_glob='log.txt*'):
+def main(logger=logging.getLogger(), ago_unit='days', ago_value=1, log_path=None, log_glob='log.txt*',
+         checkpoint_file=None, follow=False, use_daemon=False):
     """
     Main program
     :param logger: logging instance of the root logger
@@ -115,6 +135,9 @@ def main(logger=logging.getLogger(), ago_unit='days', ago_value=1, log_path=None
     :param ago_value: int Value of datetime.timedelta
     :param log_path: string Path to the log files.
     :param log_glob: string Filename glob for the log files. Defaults to 'log.txt*'
+    :param checkpoint_file: string Path to the checkpoint file. If set, only new log entries are checked.
+    :param follow: Bool If True, keep running and print the ERRORs as they are written to the log.
+    :param use_daemon: bool Search with the synology_abfb_daemon.py example if it is running
     :return: None
     """
     after = datetime.timedelta(**{ago_unit: ago_value})
@@ -133,22 +156,43 @@ def main(logger=logging.getLogger(), ago_unit='days', ago_value=1, log_path=None
         filename_glob=log_glob,
 
         # Pass the logger
-        logger=logger
-    )
+        logger=logger,
 
-    # Load the log entries
-    if log_path:
-        logger.debug(f'Loading log files in "{log_path}"')
-    else:
-        logger.debug(f'Loading log files in the default location')
-    synology.load()
+        # Only check the log entries written since the last run
+        checkpoint_file=checkpoint_file,
+    )
 
     # Search for entries that match the criteria.
     find = {
         'priority': 'ERROR',
     }
-    logger.debug('Searching the log files')
-    found = synology.search(find=find)
+
+    if follow:
+        logger.debug('Following the log file')
+        try:
+            for event in synology.follow(find=find):
+                ts = event['datetime'].strftime('%Y-%m-%d %X')
+                print(f"{ts}: {event['priority']} {event['message']}", flush=True)
+        except KeyboardInterrupt:
+            pass
+        exit(0)
+
+    if use_daemon and not checkpoint_file:
+        # Search with the daemon if it is running. Otherwise, load the log files in this process.
+        # The daemon does not keep checkpoints.
+        from synology_abfb_log_parser import abfb_daemon
+        logger.debug('Searching the log files with the daemon')
+        found = abfb_daemon.search(find=find, after=after, log_path=log_path, filename_glob=log_glob, logger=logger)
+    else:
+        # Load the log entries
+        if log_path:
+            logger.debug(f'Loading log files in "{log_path}"')
+        else:
+            logger.debug(f'Loading log files in the default location')
+        synology.load()
+
+        logger.debug('Searching the log files')
+        found = synology.search(find=find)
     ts = (datetime.datetime.now() - after).strftime('%Y-%m-%d %X')
     if not found:
         logger.info(f"No log entries found since {ts}")
@@ -200,6 +244,12 @@ if __name__ == '__main__':
                         help='time span unit, one of [seconds, minutes, hours, days, weeks]')
     parser.add_argument('--ago-value', default='1', type=int,
                         help='time span value')
+    parser.add_argument('--checkpoint-file', default='', type=str,
+                        help='file to save the read position in to only check new log entries')
+    parser.add_argument('--follow', default=False, action='store_true',
+                        help='keep running and print the ERRORs as they are written')
+    parser.add_argument('--use-daemon', default=False, action='store_true',
+                        help='search with the synology_abfb_daemon.py example if it is running')
     parser.add_argument('--auto-upgrade', default=False, action='store_true',
                         help='auto-upgrade the synology_abfb_log_parser module')
     args = parser.parse_args()
@@ -227,4 +277,7 @@ if __name__ == '__main__':
         'log_glob': args.log_glob,
         'ago_unit': args.ago_unit,
         'ago_value': args.ago_value,
+        'checkpoint_file': args.checkpoint_file,
+        'follow': args.follow,
+        'use_daemon': args.use_daemon,
     })
@@ -30,7 +30,7 @@ usage: trmm-synology_abfb_not_complete.py [-h]
                                           [--log-glob LOG_GLOB]
                                           [--ago-unit AGO_UNIT]
                                           [--ago-value AGO_VALUE]
-                                          [--auto-upgrade]
+                                          [--use-daemon] [--auto-upgrade]
 
 Parse the Synology Active Backup for Business logs.
 
@@ -45,6 +45,8 @@ optional arguments:
                         weeks]
   --ago-value AGO_VALUE
                         time span value
+  --use-daemon          search with the synology_abfb_daemon.py example if it
+                        is running
   --auto-upgrade        auto-upgrade the synology_abfb_log_parser module
 
 """
@@ -102,7 +104,8 @@ except ModuleNotFoundError:
         import synology_abfb_log_parser
 
 
-def main(logger=logging.getLogger(), ago_unit='days', ago_value=1, log_path=None, log_glob='log.txt*'):
+def main(logger=logging.getLogger(), ago_unit='days', ago_value=1, log_path=None, log_glob='log.txt*',
+         use_daemon=False):
     """
     Main program
     :param logger: logging instance of the root logger
@@ -112,34 +115,11 @@ def main(logger=logging.getLogger(), ago_unit='days', ago_value=1, log_path=None
     :param ago_value: int Value of datetime.timedelta
     :param log_path: string Path to the log files.
     :param log_glob: string Filename glob for the log files. Defaults to 'log.txt*'
+    :param use_daemon: bool Search with the synology_abfb_daemon.py example if it is running
     :return: None
     """
     after = datetime.timedelta(**{ago_unit: ago_value})
 
-    # Since the package was imported, the syntax is package.subpackage.Class()
-    synology = synology_abfb_log_parser.abfb_log_parser.ActiveBackupLogParser(
-        # Search logs within the period specified.
-        # timedelta() will be off by 1 minute because 1 minute is added to detect if the log entry is last year vs.
-        # this year. This should be negligible.
-        after=after,
-
-        # Use different log location
-        log_path=log_path,
-
-        # Use different filename globbing
-        filename_glob=log_glob,
-
-        # Pass the logger
-        logger=logger
-    )
-
-    # Load the log entries
-    if log_path:
-        logger.debug(f'Loading log files in "{log_path}"')
-    else:
-        logger.debug(f'Loading log files in the default location')
-    synology.load()
-
     # Search for entries that match the criteria.
     find = {
         'method_name': 'server-requester.cpp',
@@ -151,8 +131,39 @@ def main(logger=logging.getLogger(), ago_unit='days', ago_value=1, log_path=None
             }
         },
     }
-    logger.debug('Searching the log files')
-    found = synology.search(find=find)
+
+    if use_daemon:
+        # Search with the daemon if it is running. Otherwise, load the log files in this process.
+        from synology_abfb_log_parser import abfb_daemon
+        logger.debug('Searching the log files with the daemon')
+        found = abfb_daemon.search(find=find, after=after, log_path=log_path, filename_glob=log_glob, logger=logger)
+    else:
+        # Since the package was imported, the syntax is package.subpackage.Class()
+        synology = synology_abfb_log_parser.abfb_log_parser.ActiveBackupLogParser(
+            # Search logs within the period specified.
+            # timedelta() will be off by 1 minute because 1 minute is added to detect if the log entry is last year vs.
+            # this year. This should be negligible.
+            after=after,
+
+            # Use different log location
+            log_path=log_path,
+
+            # Use different filename globbing
+            filename_glob=log_glob,
+
+            # Pass the logger
+            logger=logger
+        )
+
+        # Load the log entries
+        if log_path:
+            logger.debug(f'Loading log files in "{log_path}"')
+        else:
+            logger.debug(f'Loading log files in the default location')
+        synology.load()
+
+        logger.debug('Searching the log files')
+        found = synology.search(find=find)
     ts = (datetime.datetime.now() - after).strftime('%Y-%m-%d %X')
     if not found:
         logger.info(f"No log entries found since {ts}")
@@ -216,6 +227,8 @@ if __name__ == '__main__':
                         help='time span unit, one of [seconds, minutes, hours, days, weeks]')
     parser.add_argument('--ago-value', default='1', type=int,
                         help='time span value')
+    parser.add_argument('--use-daemon', default=False, action='store_true',
+                        help='search with the synology_abfb_daemon.py example if it is running')
     parser.add_argument('--auto-upgrade', default=False, action='store_true',
                         help='auto-upgrade the synology_abfb_log_parser module')
     args = parser.parse_args()
@@ -243,4 +256,5 @@ if __name__ == '__main__':
         'log_glob': args.log_glob,
         'ago_unit': args.ago_unit,
         'ago_value': args.ago_value,
+        'use_daemon': args.use_daemon,
     })
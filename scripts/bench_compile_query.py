@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Check that compile_query() matches the same log entries as is_subset() and compare their speed.
+
+search() and stream() compile the find dict with compile_query() instead of walking it with is_subset() for every log
+entry. Random subsets and supersets made of dicts, lists and plain values are checked with compile_subset() against
+is_subset(). Both must return the same, or both raise TypeError on a type mismatch, e.g. a dict key looked up in a
+string. Then a deep find dict is timed both ways against a log entry it matches.
+
+$ python3 scripts/bench_compile_query.py --help
+usage: bench_compile_query.py [-h] [--fuzz FUZZ] [--seed SEED]
+                              [--number NUMBER] [--repeat REPEAT]
+
+Check compile_query() against is_subset().
+
+optional arguments:
+  -h, --help       show this help message and exit
+  --fuzz FUZZ      number of random subsets to check
+  --seed SEED      seed for the random subsets
+  --number NUMBER  number of matches per timing
+  --repeat REPEAT  number of times to repeat the timing
+
+"""
+import argparse
+import os.path
+import random
+import sys
+import timeit
+
+# Use the local copy instead of the installed package.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from synology_abfb_log_parser import abfb_log_parser
+
+# FUZZ_VALUES are the plain values of the random subsets and supersets.
+FUZZ_VALUES = [1, 2, 'a', 'b', None, True]
+
+# EVENT is a log entry with JSON, and FIND is a deep find dict that matches it.
+EVENT = {
+    'priority': 'INFO',
+    'method_name': 'server-requester.cpp',
+    'method_num': '120',
+    'message': 'x',
+    'json': {
+        'backup_result': {
+            'last_backup_status': 'complete',
+            'last_success_time': 1,
+        },
+        'running_task_result': {},
+    },
+}
+FIND = {
+    'method_name': 'server-requester.cpp',
+    'json': {
+        'backup_result': {
+            'last_backup_status': 'complete',
+        },
+    },
+}
+
+
+def fuzz_value(rnd, depth=0):
+    """
+    fuzz_value will return a random dict, list or plain value.
+
+    :param rnd: random.Random
+    :param depth: int depth of the value
+    :return: dict, list or plain value
+    """
+    choice = rnd.random()
+    if depth > 2 or choice < 0.3:
+        return rnd.choice(FUZZ_VALUES)
+    if choice < 0.7:
+        return {rnd.choice('xyz'): fuzz_value(rnd, depth + 1) for _ in range(rnd.randint(0, 3))}
+    return [fuzz_value(rnd, depth + 1) for _ in range(rnd.randint(0, 3))]
+
+
+def match(function, *args):
+    """
+    match will call function, or return 'TypeError' if it raises TypeError.
+
+    :param function: function to call
+    :param args: arguments of the function
+    :return: bool result, or string 'TypeError'
+    """
+    try:
+        return function(*args)
+    except TypeError:
+        return 'TypeError'
+
+
+def check(count, seed):
+    """
+    check will return the random subsets and supersets compile_subset() and is_subset() don't agree on.
+
+    :param count: int number of random subsets
+    :param seed: int random seed
+    :return: list of tuples (subset, superset, is_subset, compiled)
+    """
+    parser = abfb_log_parser.ActiveBackupLogParser()
+    rnd = random.Random(seed)
+    mismatches = []
+    for _ in range(count):
+        subset, superset = fuzz_value(rnd), fuzz_value(rnd)
+        expected = match(parser.is_subset, subset, superset)
+        found = match(lambda: abfb_log_parser.compile_subset(subset)(superset))
+        if expected != found:
+            mismatches.append((subset, superset, expected, found))
+    return mismatches
+
+
+def main(fuzz=200000, seed=0, number=300000, repeat=5):
+    """
+    Main program
+    :param fuzz: int number of random subsets to check
+    :param seed: int seed for the random subsets
+    :param number: int number of matches per timing
+    :param repeat: int number of times to repeat the timing
+    :return: int exit code. 1 if any subset does not match.
+    """
+    mismatches = check(fuzz, seed)
+    print(f'fuzz: {fuzz} subsets, {len(mismatches)} mismatches')
+    for subset, superset, expected, found in mismatches[:10]:
+        print(f'    subset:    {subset!r}')
+        print(f'    superset:  {superset!r}')
+        print(f'    is_subset: {expected!r}  compiled: {found!r}')
+
+    parser = abfb_log_parser.ActiveBackupLogParser()
+    query = abfb_log_parser.compile_query(FIND)
+    for name, function in (
+            ('is_subset()', lambda: parser.is_subset(FIND, EVENT)),
+            ('compile_query()', lambda: query(EVENT)),
+    ):
+        seconds = min(timeit.repeat(function, number=number, repeat=repeat))
+        print(f'{name:16s} {seconds / number * 1e6:5.2f}us per log entry')
+
+    return 1 if mismatches else 0
+
+
+# Main entrance here...
+if __name__ == '__main__':
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description='Check compile_query() against is_subset().')
+    parser.add_argument('--fuzz', default=200000, type=int,
+                        help='number of random subsets to check')
+    parser.add_argument('--seed', default=0, type=int,
+                        help='seed for the random subsets')
+    parser.add_argument('--number', default=300000, type=int,
+                        help='number of matches per timing')
+    parser.add_argument('--repeat', default=5, type=int,
+                        help='number of times to repeat the timing')
+    args = parser.parse_args()
+
+    sys.exit(main(**{
+        'fuzz': args.fuzz,
+        'seed': args.seed,
+        'number': args.number,
+        'repeat': args.repeat,
+    }))
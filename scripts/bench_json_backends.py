@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Compare the speed of decode_json() with each JSON module that is installed, on the JSON in the log messages of
+repair_json_corpus.json.
+
+The JSON candidates of each message are repaired with repair_json(), like the parser does, and decoded with each JSON
+module. The valid and invalid JSON are timed separately because invalid JSON is decoded again with the json module.
+The results are compared with the json module. ujson accepts some invalid JSON, see JSON_BACKENDS.
+
+$ python3 scripts/bench_json_backends.py --help
+usage: bench_json_backends.py [-h] [--corpus CORPUS] [--number NUMBER]
+                              [--repeat REPEAT]
+
+Compare decode_json() with each JSON module.
+
+optional arguments:
+  -h, --help       show this help message and exit
+  --corpus CORPUS  JSON file with a list of log messages
+  --number NUMBER  number of times to decode the corpus per timing
+  --repeat REPEAT  number of times to repeat the timing
+
+"""
+import argparse
+import json
+import logging
+import os.path
+import sys
+import timeit
+
+# Use the local copy instead of the installed package.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from synology_abfb_log_parser import abfb_log_parser
+
+
+def decode(json_str, loads):
+    """
+    decode will decode a JSON string with decode_json(), or return the name of the exception.
+
+    :param json_str: string JSON
+    :param loads: loads function of the JSON module, or None for the standard library
+    :return: decoded JSON, or string name of the exception
+    """
+    try:
+        return abfb_log_parser.decode_json(json_str, loads)
+    except ValueError as err:
+        return type(err).__name__
+
+
+def main(corpus, number=200, repeat=5):
+    """
+    Main program
+    :param corpus: string path to the JSON file with the log messages
+    :param number: int number of times to decode the corpus per timing
+    :param repeat: int number of times to repeat the timing
+    :return: None
+    """
+    # repair_json() logs the strings it can't fix.
+    logging.disable(logging.CRITICAL)
+
+    with open(corpus, mode='r', encoding='utf-8') as fh:
+        messages = json.load(fh)
+    candidates = [abfb_log_parser.repair_json(candidate)
+                  for message in messages for candidate in abfb_log_parser.json_candidates(message)]
+    valid = []
+    invalid = []
+    for candidate in candidates:
+        if isinstance(decode(candidate, None), str):
+            invalid.append(candidate)
+        else:
+            valid.append(candidate)
+    print(f'{len(candidates)} JSON candidates: {len(valid)} valid, {len(invalid)} invalid')
+
+    for name in abfb_log_parser.JSON_BACKENDS:
+        name, loads = abfb_log_parser.find_json_backend(name)
+        if loads is None and name != 'json':
+            print(f'{name:9s} not installed')
+            continue
+        row = []
+        for strings in (valid, invalid):
+            seconds = min(timeit.repeat(lambda: [decode(json_str, loads) for json_str in strings], number=number,
+                                        repeat=repeat))
+            row.append(seconds / number / max(len(strings), 1) * 1e6)
+        differences = sum(decode(candidate, loads) != decode(candidate, None) for candidate in candidates)
+        print(f'{name:9s} valid {row[0]:6.2f}us  invalid {row[1]:6.2f}us  different from json: {differences}')
+
+
+# Main entrance here...
+if __name__ == '__main__':
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description='Compare decode_json() with each JSON module.')
+    parser.add_argument('--corpus', type=str,
+                        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'repair_json_corpus.json'),
+                        help='JSON file with a list of log messages')
+    parser.add_argument('--number', default=200, type=int,
+                        help='number of times to decode the corpus per timing')
+    parser.add_argument('--repeat', default=5, type=int,
+                        help='number of times to repeat the timing')
+    args = parser.parse_args()
+
+    main(**{
+        'corpus': args.corpus,
+        'number': args.number,
+        'repeat': args.repeat,
+    })
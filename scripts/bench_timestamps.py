@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Check that TimestampDecoder returns the same timestamps as datetime.strptime() and compare their speed.
+
+TimestampDecoder replaces the datetime.strptime() call and the year rollover that parsed the timestamp of each log
+entry. Every day of a 400-day span around a few dates of "now" is checked against strptime(), including the dates that
+don't exist, such as Feb 29 of a year that is not a leap year. Then one timestamp is timed both ways.
+
+$ python3 scripts/bench_timestamps.py --help
+usage: bench_timestamps.py [-h] [--number NUMBER] [--repeat REPEAT]
+
+Check TimestampDecoder against datetime.strptime().
+
+optional arguments:
+  -h, --help       show this help message and exit
+  --number NUMBER  number of timestamps per timing
+  --repeat REPEAT  number of times to repeat the timing
+
+"""
+import argparse
+import datetime
+import os.path
+import random
+import sys
+import timeit
+
+# Use the local copy instead of the installed package.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from synology_abfb_log_parser import abfb_log_parser
+
+# NOWS are the dates of "now" that are checked: New Year, a leap day and the end of a day.
+NOWS = [
+    datetime.datetime(2026, 1, 1, 0, 0, 30, 5),
+    datetime.datetime(2024, 3, 1, 12),
+    datetime.datetime(2026, 10, 18, 13, 5, 7, 999999),
+]
+
+
+def reference(now, month, day, time):
+    """
+    reference will parse a log timestamp the way the parser did before TimestampDecoder.
+
+    :param now: datetime.datetime timestamp used to determine if the log entry is for this year or last year
+    :param month: string month abbreviation, e.g. 'Nov'
+    :param day: string day of the month
+    :param time: string time of day, e.g. '22:12:34'
+    :return: datetime.datetime timestamp
+    """
+    ts = datetime.datetime.strptime(f'{now.year} {month} {day} {time}', '%Y %b %d %X')
+    if now < ts:
+        ts = ts - datetime.timedelta(days=365)
+    return ts
+
+
+def decode(function, *args):
+    """
+    decode will call function, or return the name of the exception.
+
+    :param function: function to call
+    :param args: arguments of the function
+    :return: the result, or string name of the exception
+    """
+    try:
+        return function(*args)
+    except ValueError as err:
+        return type(err).__name__
+
+
+def check(seed=0):
+    """
+    check will return the timestamps TimestampDecoder and strptime() don't agree on.
+
+    :param seed: int random seed for the time of day
+    :return: list of tuples (now, month, day, time, reference, TimestampDecoder)
+    """
+    rnd = random.Random(seed)
+    mismatches = []
+    for now in NOWS:
+        decoder = abfb_log_parser.TimestampDecoder(now)
+        # Every day of last year and this year, plus Feb 29 and a day that doesn't exist.
+        days = [datetime.datetime(now.year - 1, 1, 1) + datetime.timedelta(days=day) for day in range(400)]
+        timestamps = [(day.strftime('%b'), str(day.day), f'{rnd.randrange(24):02d}:{rnd.randrange(60):02d}:'
+                       f'{rnd.randrange(60):02d}') for day in days]
+        timestamps += [('Feb', '29', '12:00:00'), ('Apr', '31', '12:00:00'), ('Oct', '14', '1:02:03')]
+        for month, day, time in timestamps:
+            expected = decode(reference, now, month, day, time)
+            found = decode(lambda: decoder.to_datetime(decoder.epoch(month, day, time)))
+            if expected != found:
+                mismatches.append((now, month, day, time, expected, found))
+    return mismatches
+
+
+def main(number=200000, repeat=5):
+    """
+    Main program
+    :param number: int number of timestamps per timing
+    :param repeat: int number of times to repeat the timing
+    :return: int exit code. 1 if any timestamp does not match.
+    """
+    mismatches = check()
+    print(f'{len(mismatches)} mismatches')
+    for mismatch in mismatches[:10]:
+        print(f'    {mismatch}')
+
+    now = datetime.datetime.now()
+    decoder = abfb_log_parser.TimestampDecoder(now)
+    args = ('Oct', '14', '13:01:47')
+    for name, function in (
+            ('strptime + rollover', lambda: reference(now, *args)),
+            ('epoch()', lambda: decoder.epoch(*args)),
+            ('epoch() + to_datetime()', lambda: decoder.to_datetime(decoder.epoch(*args))),
+    ):
+        seconds = min(timeit.repeat(function, number=number, repeat=repeat))
+        print(f'{name:24s} {seconds / number * 1e6:5.2f}us per timestamp')
+
+    return 1 if mismatches else 0
+
+
+# Main entrance here...
+if __name__ == '__main__':
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description='Check TimestampDecoder against datetime.strptime().')
+    parser.add_argument('--number', default=200000, type=int,
+                        help='number of timestamps per timing')
+    parser.add_argument('--repeat', default=5, type=int,
+                        help='number of times to repeat the timing')
+    args = parser.parse_args()
+
+    sys.exit(main(**{
+        'number': args.number,
+        'repeat': args.repeat,
+    }))
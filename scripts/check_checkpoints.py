@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Check that --checkpoint-file reports each log entry once while the log files are appended to, rotated and compressed.
+
+Each step changes the log files in a temporary directory the way the agent and logrotate do, loads the log entries
+with a checkpoint file and compares the messages with the expected ones. The steps run in line mode and in mmap mode.
+Run this after changing the checkpoints or how the log files are read.
+
+$ python3 scripts/check_checkpoints.py --help
+usage: check_checkpoints.py [-h]
+
+Check the checkpoints while the log files are rotated.
+
+optional arguments:
+  -h, --help  show this help message and exit
+
+"""
+import argparse
+import datetime
+import gzip
+import logging
+import os.path
+import shutil
+import sys
+import tempfile
+
+# Use the local copy instead of the installed package.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from synology_abfb_log_parser import abfb_log_parser
+
+
+def entry(message):
+    """
+    entry will return a log line with the current time.
+
+    :param message: string message
+    :return: string log line
+    """
+    now = datetime.datetime.now()
+    return f'{now.strftime("%b")} {now.day:2d} {now.strftime("%H:%M:%S")} [ERROR] server.cpp (1): {message}\r\n'
+
+
+def write(log_file, text, mode='a'):
+    """
+    write will write text to a log file with Windows line endings.
+
+    :param log_file: string path to the log file
+    :param text: string text to write
+    :param mode: string file mode
+    :return: None
+    """
+    with open(log_file, mode=mode, encoding='utf-8', newline='') as fh:
+        fh.write(text)
+
+
+def compress(log_file, compressed_file):
+    """
+    compress will compress a log file and remove it, keeping the modification time like logrotate's 'compress'.
+
+    :param log_file: string path to the log file
+    :param compressed_file: string path to the compressed log file
+    :return: None
+    """
+    stat = os.stat(log_file)
+    with open(log_file, mode='rb') as fh:
+        data = fh.read()
+    with open(compressed_file, mode='wb') as fh:
+        fh.write(gzip.compress(data))
+    os.utime(compressed_file, (stat.st_atime, stat.st_mtime))
+    os.remove(log_file)
+
+
+def rotate(log_path):
+    """
+    rotate will rename log.txt.N to log.txt.N+1 and log.txt to log.txt.1, like logrotate.
+
+    :param log_path: string path to the log files
+    :return: None
+    """
+    rotated = []
+    for filename in os.listdir(log_path):
+        parts = filename.split('.')
+        if filename.startswith('log.txt.') and parts[2].isdigit():
+            rotated.append((int(parts[2]), filename))
+    for number, filename in sorted(rotated, reverse=True):
+        suffix = filename[len(f'log.txt.{number}'):]
+        os.rename(os.path.join(log_path, filename), os.path.join(log_path, f'log.txt.{number + 1}{suffix}'))
+    os.rename(os.path.join(log_path, 'log.txt'), os.path.join(log_path, 'log.txt.1'))
+
+
+def steps(log_path):
+    """
+    steps is a generator that changes the log files and yields the name of the step and the expected messages.
+
+    :param log_path: string path to the log files
+    :return: generator of (string name, list of string messages) tuples
+    """
+    log_file = os.path.join(log_path, 'log.txt')
+
+    # The agent writes a BOM at the start of the log file.
+    write(log_file, '\ufeff' + ''.join(entry(str(number)) for number in range(5)), mode='w')
+    yield 'first run', ['0', '1', '2', '3', '4']
+    yield 'nothing new', []
+
+    write(log_file, entry('5') + '  continued\r\n' + entry('6'))
+    yield 'appended', ['5continued', '6']
+
+    # The agent has not finished writing the line.
+    write(log_file, entry('7')[:-2])
+    yield 'partial line', []
+
+    write(log_file, '\r\n')
+    rotate(log_path)
+    write(log_file, entry('8'), mode='w')
+    yield 'rotated', ['7', '8']
+
+    # logrotate's 'compress': log.txt.1 is compressed in place. It is a new inode with different bytes.
+    compress(os.path.join(log_path, 'log.txt.1'), os.path.join(log_path, 'log.txt.1.gz'))
+    yield 'compressed', []
+
+    # 'delaycompress': log.txt is rotated, written to after the last run, and compressed on the next rotation.
+    rotate(log_path)
+    write(os.path.join(log_path, 'log.txt.1'), entry('9'))
+    write(log_file, entry('10'), mode='w')
+    yield 'rotated after appending', ['9', '10']
+
+    compress(os.path.join(log_path, 'log.txt.1'), os.path.join(log_path, 'log.txt.1.gz'))
+    write(log_file, entry('11'))
+    yield 'compressed and appended', ['11']
+
+    # The reviewer's case: log.txt is compressed to log.txt.1.gz and a new log.txt is written.
+    rotate(log_path)
+    compress(os.path.join(log_path, 'log.txt.1'), os.path.join(log_path, 'log.txt.1.gz'))
+    write(log_file, entry('12') + entry('13'), mode='w')
+    yield 'rotated and compressed', ['12', '13']
+
+    # Compressed after new log entries were appended that were not read yet.
+    write(log_file, entry('14'))
+    rotate(log_path)
+    compress(os.path.join(log_path, 'log.txt.1'), os.path.join(log_path, 'log.txt.1.gz'))
+    write(log_file, entry('15'), mode='w')
+    yield 'unread log entries compressed', ['14', '15']
+    yield 'nothing new again', []
+
+
+def main(use_mmap=False):
+    """
+    Main program
+    :param use_mmap: bool True to memory map the log files
+    :return: int number of steps that failed
+    """
+    logger = logging.getLogger('check_checkpoints')
+    logger.setLevel(logging.CRITICAL)
+    log_path = tempfile.mkdtemp()
+    checkpoint_file = os.path.join(log_path, 'checkpoint.json')
+    failed = 0
+    try:
+        for name, expected in steps(log_path):
+            synology = abfb_log_parser.ActiveBackupLogParser(
+                after=datetime.timedelta(days=1),
+                log_path=log_path,
+                logger=logger,
+                checkpoint_file=checkpoint_file,
+                use_mmap=use_mmap,
+            )
+            synology.load()
+            found = [event['message'] for event in synology.search(find={'priority': 'ERROR'})]
+            if found == expected:
+                print(f'    {name}: OK')
+            else:
+                print(f'    {name}: expected {expected}, found {found}')
+                failed += 1
+    finally:
+        shutil.rmtree(log_path)
+    return failed
+
+
+# Main entrance here...
+if __name__ == '__main__':
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description='Check the checkpoints while the log files are rotated.')
+    parser.parse_args()
+
+    failures = 0
+    for mmap_mode in (False, True):
+        print(f'use_mmap={mmap_mode}')
+        failures += main(use_mmap=mmap_mode)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Check that repair_json() returns the same strings as fix_simple(fix_single_quotes()) and compare their speed.
+
+repair_json() replaces fix_simple(fix_single_quotes()) when the JSON in the log entries is parsed. Run this after
+changing either of them. The JSON candidates of each message in repair_json_corpus.json are checked, and then random
+strings made of the characters the functions look at. Add a message to the corpus when a log entry is found that the
+functions handle differently.
+
+$ python3 scripts/check_repair_json.py --help
+usage: check_repair_json.py [-h] [--corpus CORPUS] [--fuzz FUZZ] [--seed SEED]
+                            [--repeat REPEAT]
+
+Check repair_json() against fix_simple(fix_single_quotes()).
+
+optional arguments:
+  -h, --help       show this help message and exit
+  --corpus CORPUS  JSON file with a list of log messages
+  --fuzz FUZZ      number of random strings to check
+  --seed SEED      seed for the random strings
+  --repeat REPEAT  number of times to repeat the timing
+
+"""
+import argparse
+import json
+import logging
+import os.path
+import random
+import sys
+import timeit
+
+# Use the local copy instead of the installed package.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from synology_abfb_log_parser import abfb_log_parser
+
+# FUZZ_PIECES are joined at random to make the fuzz strings.
+FUZZ_PIECES = ['"{', '}"', '"', '{', '}', ', }', ', ', '\\', '\\"', '\\\\', 'a', ' ', ':', ',', '[', ']', 'é']
+
+
+def reference(json_str):
+    """
+    reference will return what repair_json() must return.
+
+    :param json_str: string JSON candidate
+    :return: string
+    """
+    return abfb_log_parser.fix_simple(abfb_log_parser.fix_single_quotes(json_str))
+
+
+def check(strings):
+    """
+    check will return the strings repair_json() and the reference don't agree on.
+
+    :param strings: list of strings
+    :return: list of tuples (string, repair_json(string), reference(string))
+    """
+    mismatches = []
+    for json_str in strings:
+        repaired = abfb_log_parser.repair_json(json_str)
+        expected = reference(json_str)
+        if repaired != expected:
+            mismatches.append((json_str, repaired, expected))
+    return mismatches
+
+
+def fuzz_strings(count, seed):
+    """
+    fuzz_strings will return random strings made of FUZZ_PIECES.
+
+    :param count: int number of strings
+    :param seed: int random seed
+    :return: list of strings
+    """
+    rnd = random.Random(seed)
+    return [''.join(rnd.choice(FUZZ_PIECES) for _ in range(rnd.randint(0, 30))) for _ in range(count)]
+
+
+def main(corpus, fuzz=100000, seed=0, repeat=5):
+    """
+    Main program
+    :param corpus: string path to the JSON file with the log messages
+    :param fuzz: int number of random strings to check
+    :param seed: int seed for the random strings
+    :param repeat: int number of times to repeat the timing
+    :return: int exit code. 1 if any string does not match.
+    """
+    # fix_single_quotes() logs the strings it can't fix.
+    logging.disable(logging.CRITICAL)
+
+    with open(corpus, mode='r', encoding='utf-8') as fh:
+        messages = json.load(fh)
+    candidates = [candidate for message in messages for candidate in abfb_log_parser.json_candidates(message)]
+    # The whole messages are checked too. They have more pieces of text around the JSON.
+    corpus_strings = candidates + messages
+
+    failed = False
+    for name, strings in (('corpus', corpus_strings), ('fuzz', fuzz_strings(fuzz, seed))):
+        mismatches = check(strings)
+        print(f'{name}: {len(strings)} strings, {len(mismatches)} mismatches')
+        for json_str, repaired, expected in mismatches[:10]:
+            print(f'    string:      {json_str!r}')
+            print(f'    repair_json: {repaired!r}')
+            print(f'    reference:   {expected!r}')
+        failed = failed or bool(mismatches)
+
+    for name, function in (('repair_json', abfb_log_parser.repair_json), ('reference', reference)):
+        seconds = min(timeit.repeat(lambda: [function(candidate) for candidate in candidates], number=100,
+                                    repeat=repeat))
+        print(f'{name}: {seconds / 100 / len(candidates) * 1e6:.2f}us per candidate')
+
+    return 1 if failed else 0
+
+
+# Main entrance here...
+if __name__ == '__main__':
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description='Check repair_json() against fix_simple(fix_single_quotes()).')
+    parser.add_argument('--corpus', type=str,
+                        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'repair_json_corpus.json'),
+                        help='JSON file with a list of log messages')
+    parser.add_argument('--fuzz', default=100000, type=int,
+                        help='number of random strings to check')
+    parser.add_argument('--seed', default=0, type=int,
+                        help='seed for the random strings')
+    parser.add_argument('--repeat', default=5, type=int,
+                        help='number of times to repeat the timing')
+    args = parser.parse_args()
+
+    sys.exit(main(**{
+        'corpus': args.corpus,
+        'fuzz': args.fuzz,
+        'seed': args.seed,
+        'repeat': args.repeat,
+    }))
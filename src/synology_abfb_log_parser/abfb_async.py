@@ -0,0 +1,135 @@
+# Synology Active Backup for Business log parser for asyncio
+# Author: David Randall
+# GitHub: https://github.com/NiceGuyIT/synology_abfb_log_parser
+# PyPi: https://pypi.org/project/synology-abfb-log-parser/
+# URL: https://NiceGuyIT.biz
+#
+# AsyncActiveBackupLogParser runs ActiveBackupLogParser in an executor, so loading the logs does not block the event
+# loop of an asyncio application.
+#
+import asyncio
+import datetime
+import itertools
+
+from . import abfb_log_parser
+
+
+class AsyncActiveBackupLogParser(object):
+    """
+    AsyncActiveBackupLogParser is the asyncio version of ActiveBackupLogParser. The file I/O and parsing run in an
+    executor, by default the thread pool of the event loop, and the log entries are handed to the event loop in
+    chunks. The parsing is done by ActiveBackupLogParser, so the log entries are the same.
+    """
+
+    def __init__(self, after=datetime.timedelta(days=1), log_path=None, filename_glob=None, logger=None,
+                 executor=None, chunk_size=1000, **kwargs):
+        """
+        Initialize class parameters.
+
+        :param after: datetime.timedelta of how far back to search.
+        :param log_path: string path to the log files
+        :param filename_glob: string filename glob pattern for the log files
+        :param logger: logging instance
+        :param executor: concurrent.futures.Executor to run the parser in. Defaults to the executor of the event loop.
+        :param chunk_size: int number of log entries aiter_events() parses between returns to the event loop
+        :param kwargs: other parameters of ActiveBackupLogParser, e.g. checkpoint_file or workers
+        """
+        self.__parser = abfb_log_parser.ActiveBackupLogParser(after=after, log_path=log_path,
+                                                              filename_glob=filename_glob, logger=logger, **kwargs)
+        self.__executor = executor
+        self.__chunk_size = chunk_size
+
+    @property
+    def parser(self):
+        """
+        parser is the ActiveBackupLogParser that does the work, e.g. for search() after aload().
+
+        :return: ActiveBackupLogParser
+        """
+        return self.__parser
+
+    async def aload(self):
+        """
+        aload is the asyncio version of load().
+
+        :return: None
+        """
+        await self.__run(self.__parser.load)
+
+    async def aload_log_file(self, log_path):
+        """
+        aload_log_file is the asyncio version of load_log_file().
+
+        :param log_path: string path to the log files
+        :return: None
+        """
+        await self.__run(self.__parser.load_log_file, log_path)
+
+    async def aiter_events(self):
+        """
+        aiter_events is the asyncio version of iter_events(). The log entries are parsed in the executor one chunk at
+        a time, so the event loop runs between chunks.
+
+        :return: async generator of dict log entries
+        """
+        events = self.__parser.iter_events()
+        while True:
+            chunk = await self.__run(self.__next_chunk, events)
+            if not chunk:
+                break
+            for event in chunk:
+                yield event
+
+    async def asearch(self, find):
+        """
+        asearch is the asyncio version of search().
+
+        :param find: dict representing the log entries to find, or a CompiledQuery returned by compile_query().
+        :return: list of Event log entries
+        """
+        return await self.__run(self.__parser.search, find)
+
+    async def aparse_json(self, index):
+        """
+        aparse_json is the asyncio version of parse_json().
+
+        :param index: int index of entry to parse
+        :return: None
+        """
+        await self.__run(self.__parser.parse_json, index)
+
+    def __next_chunk(self, events):
+        """
+        __next_chunk will parse the next chunk of log entries. Runs in the executor.
+
+        :param events: generator of dict log entries
+        :return: list of dict log entries, empty when there are no more
+        """
+        return list(itertools.islice(events, self.__chunk_size))
+
+    async def __run(self, function, *args):
+        """
+        __run will run the function in the executor and wait for the result.
+
+        :param function: callable
+        :param args: arguments of the function
+        :return: result of the function
+        """
+        return await asyncio.get_event_loop().run_in_executor(self.__executor, function, *args)
+
+
+async def aload_all(parsers, limit=4):
+    """
+    aload_all will load several parsers, e.g. one per log directory, with at most 'limit' loading at the same time.
+
+    :param parsers: iterable of AsyncActiveBackupLogParser
+    :param limit: int maximum number of parsers loading at the same time
+    :return: None
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def load(parser):
+        async with semaphore:
+            await parser.aload()
+
+    await asyncio.gather(*(load(parser) for parser in parsers))
@@ -0,0 +1,404 @@
+# Synology Active Backup for Business log parser daemon
+# Author: David Randall
+# GitHub: https://github.com/NiceGuyIT/synology_abfb_log_parser
+# PyPi: https://pypi.org/project/synology-abfb-log-parser/
+# URL: https://NiceGuyIT.biz
+#
+# The daemon keeps the parsed log entries in memory and answers searches over a local socket, so checks that run
+# often don't pay for starting Python and loading the logs every time. See examples/synology_abfb_daemon.py to start
+# it.
+#
+# The daemon and its clients prove to each other that they know a secret key before anything else is sent, so a user
+# who can't read the key file can't answer for the daemon or send it requests. The key file is created by the daemon
+# and is only trusted if other users can't read or replace it.
+#
+import datetime
+import hmac
+import json
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os.path
+import socket
+import struct
+import sys
+import traceback
+
+from . import abfb_log_parser
+
+# FAMILY is the type of socket the daemon listens on. Windows uses a named pipe.
+FAMILY = 'AF_PIPE' if sys.platform == 'win32' else 'AF_UNIX'
+
+# DEFAULT_ADDRESS is the address the daemon listens on. On Unix, the socket is in a directory only root can write to.
+# DEFAULT_AUTHKEY_FILE is the file with the secret key. On Windows, it is in the profile of SYSTEM, which only SYSTEM
+# and the Administrators can read.
+if sys.platform == 'win32':
+    DEFAULT_ADDRESS = '\\\\.\\pipe\\synology_abfb_log_parser'
+    DEFAULT_AUTHKEY_FILE = os.path.join(os.environ.get('SystemRoot', 'C:\\Windows'), 'System32', 'config',
+                                        'systemprofile', 'AppData', 'Local', 'synology_abfb_log_parser.key')
+else:
+    DEFAULT_ADDRESS = '/var/run/synology_abfb_log_parser.sock'
+    DEFAULT_AUTHKEY_FILE = '/etc/synology_abfb_log_parser.key'
+
+# AUTH_TIMEOUT is the number of seconds to wait for the other end during authentication.
+AUTH_TIMEOUT = 5.0
+
+# REQUEST_TIMEOUT is the number of seconds the daemon waits for a client to send its request or read the response.
+REQUEST_TIMEOUT = 5.0
+
+# DEFAULT_FILENAME_GLOB is the default filename glob of ActiveBackupLogParser.
+DEFAULT_FILENAME_GLOB = 'log.txt*'
+
+
+def create_authkey(authkey_file=None):
+    """
+    create_authkey will create the key file with a new random key if it does not exist. Only the owner can read it.
+
+    :param authkey_file: string path to the key file. Defaults to DEFAULT_AUTHKEY_FILE.
+    :return: bytes key
+    :raises OSError: if the key file can't be created or is not trusted
+    """
+    authkey_file = authkey_file or DEFAULT_AUTHKEY_FILE
+    try:
+        fd = os.open(authkey_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        return read_authkey(authkey_file)
+    with os.fdopen(fd, mode='w', encoding='utf-8') as fh:
+        fh.write(os.urandom(32).hex())
+    return read_authkey(authkey_file)
+
+
+def read_authkey(authkey_file=None):
+    """
+    read_authkey will read the key from the key file. On Unix, the key file must be owned by root or the current user
+    and other users must not have any permissions on it.
+
+    :param authkey_file: string path to the key file. Defaults to DEFAULT_AUTHKEY_FILE.
+    :return: bytes key
+    :raises OSError: if the key file can't be read or is not trusted
+    """
+    authkey_file = authkey_file or DEFAULT_AUTHKEY_FILE
+    with open(authkey_file, mode='rb') as fh:
+        if sys.platform != 'win32':
+            stat = os.fstat(fh.fileno())
+            if stat.st_uid not in (0, os.getuid()) or stat.st_mode & 0o077:
+                raise PermissionError(f'The key file can be read or changed by other users: {authkey_file}')
+        authkey = fh.read().strip()
+    if not authkey:
+        raise OSError(f'The key file is empty: {authkey_file}')
+    return authkey
+
+
+def authenticate(conn, authkey, server):
+    """
+    authenticate will check that the other end of the connection knows the key, and prove to it that this end does.
+    Each end sends a random challenge and checks the HMAC of it. Unlike the authkey of multiprocessing.connection,
+    each read has a timeout, so a client that connects and sends nothing can't block the daemon.
+
+    :param conn: multiprocessing.connection.Connection
+    :param authkey: bytes key
+    :param server: bool True for the daemon, which sends the first challenge
+    :return: None
+    :raises multiprocessing.AuthenticationError: if the other end does not know the key
+    :raises TimeoutError: if the other end does not answer in AUTH_TIMEOUT seconds
+    """
+    if server:
+        challenge(conn, authkey)
+        answer_challenge(conn, authkey)
+    else:
+        answer_challenge(conn, authkey)
+        challenge(conn, authkey)
+
+
+def challenge(conn, authkey):
+    """
+    challenge will send a random challenge and check the answer of the other end.
+
+    :param conn: multiprocessing.connection.Connection
+    :param authkey: bytes key
+    :return: None
+    """
+    message = os.urandom(32)
+    conn.send_bytes(message)
+    if not conn.poll(AUTH_TIMEOUT):
+        raise TimeoutError('The other end did not answer the challenge')
+    answer = conn.recv_bytes(256)
+    if not hmac.compare_digest(answer, hmac.new(authkey, message, 'sha256').digest()):
+        raise multiprocessing.AuthenticationError('The other end does not know the key')
+
+
+def answer_challenge(conn, authkey):
+    """
+    answer_challenge will answer the challenge of the other end.
+
+    :param conn: multiprocessing.connection.Connection
+    :param authkey: bytes key
+    :return: None
+    """
+    if not conn.poll(AUTH_TIMEOUT):
+        raise TimeoutError('The other end did not send a challenge')
+    message = conn.recv_bytes(256)
+    conn.send_bytes(hmac.new(authkey, message, 'sha256').digest())
+
+
+def set_timeout(conn, timeout):
+    """
+    set_timeout will limit how long a read or write on the connection can block, so a client that sends part of a
+    message and stops can't block the daemon. poll() only waits for the first byte. A read or write that times out
+    raises BlockingIOError. This is only done for Unix sockets.
+
+    :param conn: multiprocessing.connection.Connection
+    :param timeout: float seconds
+    :return: None
+    """
+    if FAMILY != 'AF_UNIX':
+        return None
+    timeval = struct.pack('ll', int(timeout), int(timeout % 1 * 1000000))
+    with socket.fromfd(conn.fileno(), socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVTIMEO, timeval)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO, timeval)
+
+
+def encode_event(event):
+    """
+    encode_event will convert a log entry to a dict that can be encoded as JSON.
+
+    :param event: dict or Event log entry
+    :return: dict log entry with the 'datetime' as epoch seconds
+    """
+    event = dict(event)
+    event['datetime'] = abfb_log_parser.TimestampDecoder.to_epoch(event['datetime'])
+    return event
+
+
+def decode_event(event):
+    """
+    decode_event will convert a log entry decoded from JSON back to a log entry.
+
+    :param event: dict log entry with the 'datetime' as epoch seconds
+    :return: dict log entry
+    """
+    event['datetime'] = abfb_log_parser.TimestampDecoder.to_datetime(event['datetime'])
+    return event
+
+
+class LogDaemon(object):
+    """
+    LogDaemon will keep the log entries of the last 'after' in a sliding window and answer searches over a local
+    socket. The log files are read incrementally before each search, so the answers are as current as a new
+    ActiveBackupLogParser. Requests and responses are JSON, not pickle, so a client can't run code in the daemon.
+    Only clients that know the key in the key file are answered.
+    """
+
+    def __init__(self, after=datetime.timedelta(days=7), log_path=None, filename_glob=None, logger=None,
+                 address=None, authkey_file=None):
+        """
+        Initialize class parameters.
+
+        :param after: datetime.timedelta of how far back the daemon keeps the log entries. Searches can't go further
+            back than this.
+        :param log_path: string path to the log files
+        :param filename_glob: string filename glob pattern for the log files
+        :param logger: logging instance
+        :param address: string address to listen on. Defaults to DEFAULT_ADDRESS.
+        :param authkey_file: string path to the key file. It is created if it does not exist. Defaults to
+            DEFAULT_AUTHKEY_FILE.
+        """
+        self.__logger = logger if logger is not None else logging.getLogger()
+        self.__after = after
+        self.__log_path = log_path or ''
+        self.__filename_glob = filename_glob or DEFAULT_FILENAME_GLOB
+        self.__address = address or DEFAULT_ADDRESS
+        self.__authkey_file = authkey_file or DEFAULT_AUTHKEY_FILE
+
+        self.__parser = abfb_log_parser.ActiveBackupLogParser(
+            after=after,
+            log_path=log_path,
+            filename_glob=filename_glob,
+            logger=self.__logger,
+            window=True,
+        )
+
+    def serve_forever(self):
+        """
+        serve_forever will load the log files and answer requests until a 'stop' request is received.
+
+        :return: None
+        """
+        try:
+            authkey = create_authkey(self.__authkey_file)
+        except OSError as err:
+            self.__logger.error(f'Failed to read the key file: {err}')
+            return None
+
+        if FAMILY == 'AF_UNIX' and os.path.exists(self.__address):
+            if ping(self.__address, self.__authkey_file):
+                self.__logger.error(f'The daemon is already running: {self.__address}')
+                return None
+            # Left over from a daemon that did not shut down cleanly.
+            try:
+                os.remove(self.__address)
+            except OSError as err:
+                self.__logger.error(f'Failed to remove the old socket: {err}')
+                return None
+
+        self.__parser.load()
+        try:
+            listener = multiprocessing.connection.Listener(self.__address, family=FAMILY)
+        except OSError as err:
+            self.__logger.error(f'Failed to listen on {self.__address}: {err}')
+            return None
+        self.__logger.info(f'Listening on {self.__address}')
+        with listener:
+            while True:
+                try:
+                    conn = listener.accept()
+                except OSError as err:
+                    self.__logger.warning(f'Failed to accept a connection: {err}')
+                    continue
+                with conn:
+                    try:
+                        set_timeout(conn, REQUEST_TIMEOUT)
+                        authenticate(conn, authkey, server=True)
+                    except (OSError, EOFError, multiprocessing.AuthenticationError) as err:
+                        self.__logger.warning(f'Failed to authenticate the client: {err}')
+                        continue
+                    try:
+                        if not conn.poll(REQUEST_TIMEOUT):
+                            raise TimeoutError(f'No request was sent in {REQUEST_TIMEOUT} seconds')
+                        message = json.loads(conn.recv_bytes().decode('utf-8'))
+                    except (OSError, EOFError, ValueError) as err:
+                        self.__logger.warning(f'Failed to read the request: {err}')
+                        continue
+                    try:
+                        response = json.dumps(self.handle(message)).encode('utf-8')
+                    except Exception as err:
+                        # A bad request must not stop the daemon.
+                        self.__logger.error(f'Failed to answer the request: {err}')
+                        self.__logger.error(traceback.format_exc())
+                        response = json.dumps({'error': f'Failed to answer the request: {err}'}).encode('utf-8')
+                    try:
+                        conn.send_bytes(response)
+                    except (OSError, ValueError) as err:
+                        self.__logger.warning(f'Failed to send the response: {err}')
+                        continue
+                if isinstance(message, dict) and message.get('op') == 'stop':
+                    self.__logger.info('Stopping')
+                    return None
+
+    def handle(self, message):
+        """
+        handle will answer a request.
+
+        The requests are dicts with the 'op' to run:
+            {'op': 'ping'}
+            {'op': 'stop'}
+            {'op': 'search', 'find': dict, 'after': float seconds, 'log_path': string, 'filename_glob': string}
+
+        :param message: dict request
+        :return: dict response with 'events' for a search, or 'error' if the request can't be answered
+        """
+        op = message.get('op') if isinstance(message, dict) else None
+        if op in ('ping', 'stop'):
+            return {'ok': True}
+        if op != 'search':
+            return {'error': f'Unknown request: {op}'}
+
+        if (message.get('log_path') or '') != self.__log_path \
+                or (message.get('filename_glob') or DEFAULT_FILENAME_GLOB) != self.__filename_glob:
+            return {'error': 'The daemon is serving a different log path'}
+        try:
+            after = datetime.timedelta(seconds=float(message['after']))
+        except (KeyError, TypeError, ValueError, OverflowError):
+            return {'error': f'Invalid after: {message.get("after")}'}
+        if after > self.__after:
+            return {'error': f'The daemon only keeps the log entries of the last {self.__after}'}
+
+        try:
+            self.__parser.load()
+            found = self.__parser.search(find=message.get('find', {}), after=after)
+            return {'events': [encode_event(event) for event in found]}
+        except Exception as err:
+            self.__logger.error(f'Failed to search: {err}')
+            self.__logger.error(traceback.format_exc())
+            return {'error': f'Failed to search: {err}'}
+
+
+def request(message, address=None, timeout=10.0, authkey_file=None):
+    """
+    request will send a request to the daemon and return the response.
+
+    :param message: dict request. See LogDaemon.handle().
+    :param address: string address of the daemon. Defaults to DEFAULT_ADDRESS.
+    :param timeout: float seconds to wait for the response
+    :param authkey_file: string path to the key file. Defaults to DEFAULT_AUTHKEY_FILE.
+    :return: dict response
+    :raises OSError: if the key file can't be read, or the daemon is not running or does not answer in time
+    :raises multiprocessing.AuthenticationError: if the other end of the socket does not know the key
+    """
+    authkey = read_authkey(authkey_file)
+    with multiprocessing.connection.Client(address or DEFAULT_ADDRESS, family=FAMILY) as conn:
+        authenticate(conn, authkey, server=False)
+        conn.send_bytes(json.dumps(message).encode('utf-8'))
+        if not conn.poll(timeout):
+            raise TimeoutError(f'The daemon did not answer in {timeout} seconds')
+        return json.loads(conn.recv_bytes().decode('utf-8'))
+
+
+def ping(address=None, authkey_file=None):
+    """
+    ping will check if the daemon is running.
+
+    :param address: string address of the daemon. Defaults to DEFAULT_ADDRESS.
+    :param authkey_file: string path to the key file. Defaults to DEFAULT_AUTHKEY_FILE.
+    :return: true if the daemon answered
+    """
+    try:
+        return request({'op': 'ping'}, address=address, timeout=1.0, authkey_file=authkey_file).get('ok', False)
+    except (OSError, EOFError, ValueError, multiprocessing.AuthenticationError):
+        return False
+
+
+def search(find, after=datetime.timedelta(days=1), log_path=None, filename_glob=None, logger=None, address=None,
+           authkey_file=None):
+    """
+    search will search the log entries with the daemon if it is running, or load and search the log files in this
+    process if it is not. The result is the same either way. The daemon is not used if the key file can't be read
+    or the other end of the socket does not know the key.
+
+    :param find: dict representing the log entries to find
+    :param after: datetime.timedelta of how far back to search
+    :param log_path: string path to the log files
+    :param filename_glob: string filename glob pattern for the log files
+    :param logger: logging instance
+    :param address: string address of the daemon. Defaults to DEFAULT_ADDRESS.
+    :param authkey_file: string path to the key file. Defaults to DEFAULT_AUTHKEY_FILE.
+    :return: list of dict log entries
+    """
+    if logger is None:
+        logger = logging.getLogger()
+    try:
+        response = request({
+            'op': 'search',
+            'find': find,
+            'after': after.total_seconds(),
+            'log_path': log_path,
+            'filename_glob': filename_glob,
+        }, address=address, authkey_file=authkey_file)
+        if 'events' in response:
+            logger.debug('Searched the log entries with the daemon')
+            return [decode_event(event) for event in response['events']]
+        logger.debug(f'The daemon did not search the log entries: {response.get("error")}')
+    except (OSError, EOFError, ValueError, TypeError, multiprocessing.AuthenticationError) as err:
+        # The daemon is not running, is not trusted, or find can't be encoded as JSON.
+        logger.debug(f'The daemon is not available: {err}')
+
+    synology = abfb_log_parser.ActiveBackupLogParser(
+        after=after,
+        log_path=log_path,
+        filename_glob=filename_glob,
+        logger=logger,
+    )
+    synology.load()
+    return synology.search(find=find)
+
@@ -0,0 +1,177 @@
+# Synology Active Backup for Business fleet log parser
+# Author: David Randall
+# GitHub: https://github.com/NiceGuyIT/synology_abfb_log_parser
+# PyPi: https://pypi.org/project/synology-abfb-log-parser/
+# URL: https://NiceGuyIT.biz
+#
+# The fleet parser searches the logs collected from many agents. The logs of each agent are in a directory named after
+# the host:
+#   <root>/<host>/log.txt*
+#
+import concurrent.futures
+import datetime
+import glob
+import heapq
+import logging
+import os.path
+import pickle
+import tempfile
+
+from . import abfb_log_parser
+
+
+def iter_host(host, log_path, after, filename_glob=None, find=None):
+    """
+    iter_host is a generator that yields the log entries of one host that match find, one at a time.
+
+    :param host: string name of the host
+    :param log_path: string path to the log files of the host
+    :param after: datetime.timedelta of how far back to search
+    :param filename_glob: string filename glob pattern for the log files
+    :param find: dict representing the log entries to find. Defaults to all the log entries.
+    :return: generator of dict log entries with the 'host', oldest first
+    """
+    synology = abfb_log_parser.ActiveBackupLogParser(after=after, log_path=log_path, filename_glob=filename_glob,
+                                                     logger=logging.getLogger(__name__))
+    if find is None:
+        events = synology.iter_events()
+    else:
+        events = synology.stream(find)
+    for event in events:
+        event['host'] = host
+        yield event
+
+
+def search_host(host, log_path, after, filename_glob=None, find=None):
+    """
+    search_host will search the logs of one host.
+
+    :param host: string name of the host
+    :param log_path: string path to the log files of the host
+    :param after: datetime.timedelta of how far back to search
+    :param filename_glob: string filename glob pattern for the log files
+    :param find: dict representing the log entries to find. Defaults to all the log entries.
+    :return: list of dict log entries with the 'host', oldest first
+    """
+    return list(iter_host(host, log_path, after, filename_glob, find))
+
+
+def spool_host(spool_file, host, log_path, after, filename_glob=None, find=None):
+    """
+    spool_host will write the log entries of one host that match find to a spool file, one at a time. This is what
+    the worker processes run. The log entries are not sent back to the parent process or held in memory.
+
+    :param spool_file: string path to the spool file
+    :param host: string name of the host
+    :param log_path: string path to the log files of the host
+    :param after: datetime.timedelta of how far back to search
+    :param filename_glob: string filename glob pattern for the log files
+    :param find: dict representing the log entries to find. Defaults to all the log entries.
+    :return: int number of log entries written
+    """
+    count = 0
+    with open(spool_file, mode='wb') as fh:
+        for event in iter_host(host, log_path, after, filename_glob, find):
+            pickle.dump(event, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            count += 1
+    return count
+
+
+def read_spool(spool_file):
+    """
+    read_spool is a generator that yields the log entries written by spool_host(), one at a time. The spool files are
+    written by this module in a private temporary directory, so they are trusted to be unpickled.
+
+    :param spool_file: string path to the spool file
+    :return: generator of dict log entries
+    """
+    with open(spool_file, mode='rb') as fh:
+        while True:
+            try:
+                yield pickle.load(fh)
+            except EOFError:
+                return
+
+
+class FleetParser(object):
+    """
+    FleetParser will search the logs of many hosts. The hosts are searched in parallel in a bounded pool of worker
+    processes. Each worker writes the log entries of its host to a spool file, and the spool files are merged by time
+    while they are read, so only one log entry per host is held in memory.
+    """
+
+    def __init__(self, root, after=datetime.timedelta(days=1), filename_glob=None, logger=None, workers=None):
+        """
+        Initialize class parameters.
+
+        :param root: string path to the directory with a directory of log files for each host
+        :param after: datetime.timedelta of how far back to search.
+        :param filename_glob: string filename glob pattern for the log files
+        :param logger: logging instance
+        :param workers: int maximum number of worker processes. Defaults to the number of CPUs.
+        """
+        self.__root = root
+        self.__after = after
+        self.__filename_glob = filename_glob or 'log.txt*'
+        self.__logger = logger if logger is not None else logging.getLogger()
+        self.__workers = workers or os.cpu_count() or 1
+
+    def hosts(self):
+        """
+        hosts will return the hosts that have log files.
+
+        :return: list of string host names, sorted
+        """
+        if not os.path.isdir(self.__root):
+            self.__logger.error(f'Error: Fleet directory does not exist: {self.__root}')
+            return []
+        return [host for host in sorted(os.listdir(self.__root))
+                if glob.glob(os.path.join(self.__root, host, self.__filename_glob))]
+
+    def iter_events(self, find=None):
+        """
+        iter_events is a generator that yields the log entries of all the hosts in time order. Each log entry has the
+        'host' it came from. Log entries with the same timestamp are in the order of the hosts.
+
+        The hosts are searched in worker processes, at most 'workers' at a time. Each worker writes the log entries
+        that match find to a spool file in a temporary directory. The spool files are merged while they are read, so
+        memory is bounded by one log entry per host, not by the size of the result. The disk space used is the size
+        of the result. The first log entry is yielded once every host has been searched, because it may come from
+        any host. With one worker or one host, the hosts are searched in this process while the log entries are
+        merged, without spool files.
+
+        :param find: dict representing the log entries to find. Defaults to all the log entries.
+        :return: generator of dict log entries
+        """
+        hosts = self.hosts()
+        if not hosts:
+            return
+
+        # The log entries of each host are in time order. They are merged like the merge step of a merge sort.
+        if self.__workers == 1 or len(hosts) == 1:
+            yield from heapq.merge(*[iter_host(host, os.path.join(self.__root, host), self.__after,
+                                               self.__filename_glob, find) for host in hosts],
+                                   key=lambda event: event['datetime'])
+            return
+
+        with tempfile.TemporaryDirectory(prefix='abfb_fleet_') as spool_dir:
+            spool_files = [os.path.join(spool_dir, f'{index}.pickle') for index in range(len(hosts))]
+            self.__logger.debug(f'Searching {len(hosts)} hosts with {self.__workers} workers')
+            with concurrent.futures.ProcessPoolExecutor(max_workers=min(self.__workers, len(hosts))) as executor:
+                futures = [executor.submit(spool_host, spool_file, host, os.path.join(self.__root, host),
+                                           self.__after, self.__filename_glob, find)
+                           for spool_file, host in zip(spool_files, hosts)]
+                for future in futures:
+                    future.result()
+
+            yield from heapq.merge(*[read_spool(spool_file) for spool_file in spool_files],
+                                   key=lambda event: event['datetime'])
+
+    def search(self, find):
+        """
+        search will return the log entries of all the hosts that match the values in find, in time order.
+
+        :param find: dict representing the log entries to find
+        :return: list of dict log entries with the 'host'
+        """
+        return list(self.iter_events(find))
@@ -5,13 +5,24 @@
 # PyPi: https://pypi.org/project/synology-abfb-log-parser/
 # URL: https://NiceGuyIT.biz
 #
+import array
+import bz2
+import codecs
+import collections.abc
+import concurrent.futures
 import datetime
 import glob
+import gzip
+import hashlib
+import io
 import json
 import logging
+import lzma
+import mmap
 import os.path
 import re
 import sys
+import time
 import traceback
 
 
@@ -84,6 +95,1256 @@ def fix_simple(json_str):
     return json_str.replace(', }', '}').replace('\\', '\\\\')
 
 
+def repair_json(json_str):
+    """
+    repair_json will fix invalid JSON strings. The result is the same as fix_simple(fix_single_quotes(json_str)).
+    fix_single_quotes() splits the string twice with regular expressions and concatenates the pieces in a loop.
+    repair_json() splits with str.split() and str.partition(), which don't scan the string character by character,
+    and joins the pieces once. Strings without '"{' skip the split, and the replacements of fix_simple() don't copy
+    strings that don't need them. Only strings without '"{', ', }' or a backslash are returned unchanged. Valid JSON
+    with any of them is rewritten too, e.g. the backslash of an escape is doubled.
+
+    :param json_str: json_str
+    :return cleaned: string
+    """
+    if not json_str:
+        return json_str
+
+    if '"{' in json_str:
+        pieces = json_str.split('"{')
+        for index in range(1, len(pieces)):
+            # Each piece after a '"{' must have exactly one '}"'. fix_single_quotes() gives up and logs why if not.
+            inner, right, rest = pieces[index].partition('}"')
+            if not right or '}"' in rest:
+                return fix_simple(fix_single_quotes(json_str))
+            pieces[index] = inner.replace('"', "'") + '}"' + rest
+        json_str = '"{'.join(pieces)
+
+    # Replacing the double quotes doesn't change the ', }' or backslashes, so fix_simple() can run last.
+    return fix_simple(json_str)
+
+
+# RE_FAKE_JSON matches the messages with strings that look like JSON but aren't.
+RE_FAKE_JSON = re.compile(r'getVolumeDetailInfo for .*Volume|Snapshot: \{|Create snapshot for')
+
+# RE_JSON_CANDIDATES are the regular expressions json_candidates() replaces. They are used for multiline strings.
+RE_JSON_CANDIDATES = [
+    re.compile(r"'(?P<json>{.*})'"),
+    re.compile(r'([^{]*)(?P<json>\{".*})(.*)'),
+]
+
+
+def json_candidates(message):
+    """
+    json_candidates will return the strings in the message that are parsed as JSON, in the order they are tried. The
+    first is the text between "'{" and the last "}'". The second is the text from the first '{"' to the last "}". This
+    is what the regular expressions in RE_JSON_CANDIDATES match, found with str.find() and str.rfind() instead of
+    backtracking.
+
+    :param message: string message
+    :return: list of string candidates
+    """
+    if '\n' in message:
+        # '.' in the regular expressions does not match newlines.
+        return [matches['json'] for matches in (regex.search(message) for regex in RE_JSON_CANDIDATES) if matches]
+
+    candidates = []
+    start = message.find("'{")
+    if start >= 0:
+        end = message.rfind("}'")
+        if end >= start + 2:
+            candidates.append(message[start + 1:end + 1])
+    start = message.find('{"')
+    if start >= 0:
+        end = message.rfind('}')
+        if end >= start + 2:
+            candidates.append(message[start:end + 1])
+    return candidates
+
+
+def reverse_lines(fh, end, block_size=64 * 1024):
+    """
+    reverse_lines is a generator that yields the lines of a binary file from the end to the beginning. The file is
+    read backwards in blocks, so only the part of the file that is consumed is read.
+
+    :param fh: binary file handle
+    :param end: int byte offset to start reading backwards from, usually the file size
+    :param block_size: int number of bytes to read at a time
+    :return: generator of (int byte offset, bytes line) tuples, last line first. The line does not include the newline.
+    """
+    carry = b''
+    pos = end
+    while pos > 0:
+        size = min(block_size, pos)
+        pos -= size
+        fh.seek(pos)
+        lines = (fh.read(size) + carry).split(b'\n')
+        # The first piece may be the end of a line that starts in the previous block.
+        carry = lines[0]
+        offsets = []
+        offset = pos + len(carry) + 1
+        for line in lines[1:]:
+            offsets.append(offset)
+            offset += len(line) + 1
+        for index in range(len(offsets) - 1, -1, -1):
+            yield offsets[index], lines[index + 1]
+    if end > 0:
+        yield 0, carry
+
+
+# _numpy is the numpy module once imported by numpy_module(). False if it is not installed.
+_numpy = None
+
+
+def numpy_module():
+    """
+    numpy_module will return the numpy module if it is installed. NumPy is optional and only imported the first time
+    it is needed, so it does not slow down the start of short checks.
+
+    :return: numpy module, or None if it is not installed
+    """
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy or None
+
+
+# _zstandard is the zstandard module once imported by zstandard_module(). False if it is not installed.
+_zstandard = None
+
+
+def zstandard_module():
+    """
+    zstandard_module will return the zstandard module if it is installed. zstandard is optional and only needed to
+    read log files compressed with zstd.
+
+    :return: zstandard module, or None if it is not installed
+    """
+    global _zstandard
+    if _zstandard is None:
+        try:
+            import zstandard
+            _zstandard = zstandard
+        except ImportError:
+            _zstandard = False
+    return _zstandard or None
+
+
+# JSON_BACKENDS are the JSON modules that can decode the JSON in the log entries, fastest first. 'json' is the
+# standard library. ujson is only used when it is chosen because it accepts some invalid JSON, e.g. numbers with
+# leading zeros, that the standard library rejects.
+JSON_BACKENDS = ('orjson', 'simdjson', 'ujson', 'json')
+
+# JSON_AUTO_BACKENDS are the JSON modules find_json_backend() picks from when a JSON module isn't chosen.
+JSON_AUTO_BACKENDS = ('orjson', 'simdjson', 'json')
+
+# LONG_NUMBER is a number with 19 digits, after the digits are translated to '0' with DIGITS_TO_ZERO. Numbers this long
+# might not fit in 64 bits. orjson decodes them as floats and simdjson rejects them, so decode_json() leaves them to the
+# standard library. A substring search of the translated bytes is several times faster than a regular expression.
+LONG_NUMBER = b'0' * 19
+DIGITS_TO_ZERO = bytes.maketrans(b'123456789', b'000000000')
+
+# _json_loads are the loads() functions of the JSON modules once imported by find_json_backend(). False if the module
+# is not installed.
+_json_loads = {}
+
+
+def find_json_backend(name=None):
+    """
+    find_json_backend will return the loads() function of a JSON module. The JSON modules are optional and only
+    imported the first time they are needed.
+
+    :param name: string name of the JSON module in JSON_BACKENDS. Defaults to the first of JSON_AUTO_BACKENDS that is
+        installed.
+    :return: tuple of (string name, loads function), or (name, None) for the standard library or if the JSON module is
+        not installed
+    :raises ValueError: if the name is not in JSON_BACKENDS
+    """
+    if name is None:
+        for name in JSON_AUTO_BACKENDS:
+            name, loads = find_json_backend(name)
+            if loads is not None:
+                break
+        return name, loads
+
+    if name not in JSON_BACKENDS:
+        raise ValueError(f'Unknown JSON backend: {name}. Valid choices are: {", ".join(JSON_BACKENDS)}')
+    if name == 'json':
+        return name, None
+    if name not in _json_loads:
+        try:
+            _json_loads[name] = __import__(name).loads
+        except ImportError:
+            _json_loads[name] = False
+    return name, _json_loads[name] or None
+
+
+def decode_json(json_str, loads=None):
+    """
+    decode_json will decode a JSON string with the loads() function from find_json_backend(). If loads() fails, the
+    standard library decodes the string, so the same strings are accepted and rejected as with the standard library.
+    The exception is ujson, see JSON_BACKENDS.
+
+    :param json_str: string JSON
+    :param loads: loads function of the JSON module, or None for the standard library
+    :return: decoded JSON
+    :raises json.decoder.JSONDecodeError: if the string is not valid JSON
+    """
+    if loads is not None and LONG_NUMBER not in json_str.encode('utf-8', 'surrogatepass').translate(DIGITS_TO_ZERO):
+        try:
+            return loads(json_str)
+        except (ValueError, RuntimeError):
+            # Retried with the standard library below, outside the except, so the error is not chained.
+            pass
+    return json.loads(json_str, strict=False)
+
+
+# COMPRESSION_MAGIC maps the magic bytes at the start of a compressed file to the compression.
+COMPRESSION_MAGIC = {
+    b'\x1f\x8b': 'gzip',
+    b'BZh': 'bz2',
+    b'\xfd7zXZ\x00': 'xz',
+    b'\x28\xb5\x2f\xfd': 'zstd',
+}
+
+
+def compression_type(log_path):
+    """
+    compression_type will detect if a log file is compressed from the magic bytes at the start of the file. The
+    filename is not used because logrotate can be configured to use any extension.
+
+    :param log_path: string path to the log file
+    :return: string compression, one of ['gzip', 'bz2', 'xz', 'zstd'], or None if the file is not compressed
+    """
+    with open(log_path, mode='rb') as fh:
+        head = fh.read(6)
+    for magic, compression in COMPRESSION_MAGIC.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def open_log_file(log_path, compression=None):
+    """
+    open_log_file will open a log file for reading in binary mode. Compressed log files are decompressed while they
+    are read, so only a block of the decompressed file is held in memory at a time. Compressed log files can only be
+    read forward.
+
+    :param log_path: string path to the log file
+    :param compression: string compression returned by compression_type(), or None if the file is not compressed
+    :return: binary file handle
+    """
+    if compression == 'gzip':
+        return gzip.open(log_path, mode='rb')
+    if compression == 'bz2':
+        return bz2.open(log_path, mode='rb')
+    if compression == 'xz':
+        return lzma.open(log_path, mode='rb')
+    if compression == 'zstd':
+        zstandard = zstandard_module()
+        if zstandard is None:
+            raise OSError(f'The zstandard module is required to read zstd compressed log files: {log_path}')
+        reader = zstandard.ZstdDecompressor().stream_reader(open(log_path, mode='rb'), closefd=True)
+        return io.BufferedReader(reader)
+    return open(log_path, mode='rb')
+
+
+def compile_query(find):
+    """
+    compile_query will compile the find dict into a CompiledQuery. search() and stream() compile find on every call.
+    Compile it once to reuse it for many searches.
+
+    :param find: dict representing the log entries to find.
+    :return: CompiledQuery
+    """
+    if isinstance(find, CompiledQuery):
+        return find
+    return CompiledQuery(find)
+
+
+def compile_subset(subset):
+    """
+    compile_subset will compile subset into a function that returns true if subset is a subset of the superset
+    passed to it. The function has the same semantics as ActiveBackupLogParser.is_subset(), but walks subset once
+    instead of on every call.
+
+    :param subset: dict, list, set or plain value of the subset
+    :return: function that takes the superset and returns true if subset is a subset of it
+    """
+    if subset is None:
+        return lambda superset: False
+
+    if isinstance(subset, dict):
+        # Plain values are compared inline. Everything else is compiled recursively. The keys are checked in the
+        # same order as is_subset() does, so a superset of the wrong type raises or returns false the same way.
+        items = []
+        for key, val in subset.items():
+            if val is None or isinstance(val, (dict, list, set)):
+                items.append((key, None, compile_subset(val)))
+            else:
+                items.append((key, val, None))
+
+        def match_dict(superset):
+            if superset is None:
+                return False
+            for key, val, match in items:
+                if key not in superset:
+                    return False
+                if match is None:
+                    value = superset[key]
+                    if value is None or not val == value:
+                        return False
+                elif not match(superset[key]):
+                    return False
+            return True
+        return match_dict
+
+    if isinstance(subset, list) or isinstance(subset, set):
+        matches = [compile_subset(subitem) for subitem in subset]
+
+        def match_items(superset):
+            if superset is None:
+                return False
+            for match in matches:
+                for superitem in superset:
+                    if match(superitem):
+                        break
+                else:
+                    return False
+            return True
+        return match_items
+
+    # assume that subset is a plain value if none of the above match
+    return lambda superset: superset is not None and subset == superset
+
+
+def compile_key_paths(subset):
+    """
+    compile_key_paths will compile the keys and string values of the 'json' in find into a function that returns
+    false if the JSON in a message can't match, without extracting the JSON. repair_json() never adds double quotes
+    and the JSON is decoded from a part of the message, so every key of the JSON is in the message in double quotes,
+    and so is every string value. A nested key is after its parent key and a value is after its key.
+
+    Example:
+    Given the subset
+        {'backup_result': {'last_backup_status': 'complete'}}
+    the message must have '"backup_result"', then '"last_backup_status"', then '"complete"'.
+
+    Lists and sets are skipped because their items are compared in any order, and so are strings with characters that
+    repair_json() changes.
+
+    :param subset: dict of the 'json' in find
+    :return: function that takes the message and returns false if the JSON can't match, or None if subset has no keys
+        to look for
+    """
+    paths = _key_paths(subset)
+    if not paths:
+        return None
+
+    def match_paths(message, paths=paths, start=0):
+        for token, nested in paths:
+            position = message.find(token, start)
+            if position < 0:
+                return False
+            if nested and not match_paths(message, nested, position + len(token)):
+                return False
+        return True
+    return match_paths
+
+
+def _key_paths(subset):
+    """
+    _key_paths will return the keys and string values of subset as strings in double quotes, each with the strings
+    nested below it.
+
+    :param subset: dict, list, set or plain value of the subset
+    :return: list of (string token, list of nested) tuples
+    """
+    if not isinstance(subset, dict):
+        return []
+    paths = []
+    for key, val in subset.items():
+        if isinstance(val, dict):
+            nested = _key_paths(val)
+        elif isinstance(val, str) and not RE_KEY_PATH_UNSAFE.search(val):
+            nested = [(f'"{val}"', [])]
+        else:
+            nested = []
+        if isinstance(key, str) and not RE_KEY_PATH_UNSAFE.search(key):
+            paths.append((f'"{key}"', nested))
+        else:
+            # The key can't be looked for, but what is nested below it can.
+            paths.extend(nested)
+    return paths
+
+
+# RE_KEY_PATH_UNSAFE matches the characters repair_json() changes or that can't be in a key without an escape.
+RE_KEY_PATH_UNSAFE = re.compile(r'["\'\\{}]')
+
+
+class CompiledQuery(object):
+    """
+    CompiledQuery is a find dict compiled by compile_query(). The top-level values, e.g. 'priority' and
+    'method_name', and the 'json' value are compiled separately so the JSON only needs to be extracted from the
+    message if the top-level values match. The JSON is also not extracted if the message is missing the keys in the
+    'json' value, see compile_key_paths().
+    """
+
+    def __init__(self, find):
+        """
+        Initialize class parameters.
+
+        :param find: dict representing the log entries to find.
+        """
+        self.find = find
+        if not isinstance(find, dict):
+            # Not a dict. Compare everything after extracting the JSON.
+            self.top_level = compile_subset({})
+            self.json = compile_subset(find)
+            self.key_paths = None
+        else:
+            self.top_level = compile_subset({key: val for key, val in find.items() if key != 'json'})
+            self.json = None
+            self.key_paths = None
+            if 'json' in find:
+                self.json = compile_subset({'json': find['json']})
+                self.key_paths = compile_key_paths(find['json'])
+
+    def __call__(self, event):
+        """
+        Check if the log entry matches. The JSON must already be extracted from the message.
+
+        :param event: dict log entry
+        :return: true if the log entry matches
+        """
+        return self.top_level(event) and (self.json is None or self.json(event))
+
+
+# MONTHS maps the month abbreviations in the log timestamps to the month number.
+MONTHS = {
+    'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+    'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12,
+}
+
+
+class TimestampDecoder(object):
+    """
+    TimestampDecoder will convert the log timestamps to seconds since the epoch. It replaces datetime.strptime(),
+    which is slow, with a lookup table for the months, integer arithmetic for the time of day and a cache of the
+    seconds at midnight keyed by the month and day.
+
+    The logs do not contain the year or timezone. The year is the year of "now", or last year if the timestamp is in
+    the future. The epoch seconds are the local (wall clock) time, so they are only comparable with each other and
+    with to_epoch().
+    """
+
+    # __epoch is the start of the epoch for the local time.
+    __epoch = datetime.datetime(1970, 1, 1)
+
+    def __init__(self, now):
+        """
+        Initialize class parameters.
+
+        :param now: datetime.datetime timestamp used to determine if the log entry is for this year or last year.
+        """
+        self.__year = now.year
+        self.__now = self.to_epoch(now)
+
+        # __days caches the epoch seconds at midnight of this year and 365 days before by the month and day.
+        self.__days = {}
+
+    @classmethod
+    def to_epoch(cls, timestamp):
+        """
+        to_epoch will convert a datetime to epoch seconds. Microseconds are truncated.
+
+        :param timestamp: datetime.datetime timestamp
+        :return: int epoch seconds
+        """
+        return ((timestamp.toordinal() - cls.__epoch.toordinal()) * 86400
+                + timestamp.hour * 3600 + timestamp.minute * 60 + timestamp.second)
+
+    @classmethod
+    def to_datetime(cls, epoch):
+        """
+        to_datetime will convert epoch seconds to a datetime.
+
+        :param epoch: int epoch seconds
+        :return: datetime.datetime timestamp
+        """
+        return cls.__epoch + datetime.timedelta(seconds=epoch)
+
+    def epoch(self, month, day, time):
+        """
+        epoch will convert a log timestamp to epoch seconds.
+
+        :param month: string month abbreviation, e.g. 'Nov'
+        :param day: string day of the month
+        :param time: string time of day, e.g. '22:12:34'
+        :return: int epoch seconds
+        """
+        days = self.__days.get((month, day))
+        if days is None:
+            days = self.__days[(month, day)] = self.__midnight(month, day)
+
+        if len(time) == 8 and time[2] == ':' and time[5] == ':' and time[:2] < '24' and time[3] < '6' and time[6] < '6':
+            seconds = int(time[:2]) * 3600 + int(time[3:5]) * 60 + int(time[6:])
+        else:
+            # Not in HH:MM:SS format. Let strptime() parse or reject it.
+            ts = datetime.datetime.strptime(time, '%X')
+            seconds = ts.hour * 3600 + ts.minute * 60 + ts.second
+
+        epoch = days[0] + seconds
+        if self.__now < epoch:
+            # Log timestamp is in the future indicating the log entry is from last year. Subtract one year.
+            # FIXME: This does not take into account leap years. It may be off 1 day on leap years.
+            epoch = days[1] + seconds
+        return epoch
+
+    def advance(self, now):
+        """
+        advance will move "now" forward. Used by long-running processes, where the log entries would be in the future
+        of the "now" the decoder was created with and be taken for last year's.
+
+        :param now: datetime.datetime timestamp used to determine if the log entry is for this year or last year.
+        :return: None
+        """
+        if now.year != self.__year:
+            # The cached days are for the old year.
+            self.__year = now.year
+            self.__days = {}
+        self.__now = self.to_epoch(now)
+
+    def __midnight(self, month, day):
+        """
+        __midnight will calculate the epoch seconds at midnight of the day in this year and 365 days before.
+
+        :param month: string month abbreviation
+        :param day: string day of the month
+        :return: tuple of (int epoch seconds this year, int epoch seconds 365 days before)
+        """
+        if month in MONTHS and len(day) <= 2:
+            # Raises ValueError if the day is out of range for the month, like strptime().
+            midnight = datetime.datetime(self.__year, MONTHS[month], int(day))
+        else:
+            midnight = datetime.datetime.strptime(f'{self.__year} {month} {day}', '%Y %b %d')
+        epoch = self.to_epoch(midnight)
+        return epoch, epoch - 365 * 86400
+
+
+# JSON_UNPARSED is the 'json' of a log entry in an EventStore before the JSON is extracted from the message. The JSON
+# is extracted the first time it is read.
+JSON_UNPARSED = object()
+
+# JSON_INVALID is cached in a JsonCache for the JSON strings that could not be decoded.
+JSON_INVALID = object()
+
+
+class Event(collections.abc.Mapping):
+    """
+    Event is a lightweight view of a log entry in an EventStore. It can be used like the dict log entries, e.g.
+    event['priority'] or event.get('json'), or with attributes, e.g. event.priority. Use to_dict() to get a dict.
+    """
+
+    __slots__ = ('__store', '__index')
+
+    # KEYS are the keys of a log entry.
+    KEYS = ('datetime', 'timestamp', 'priority', 'method_name', 'method_num', 'message', 'json')
+
+    def __init__(self, store, index):
+        """
+        Initialize class parameters.
+
+        :param store: EventStore the log entry is in
+        :param index: int index of the log entry in the store
+        """
+        self.__store = store
+        self.__index = index
+
+    @property
+    def datetime(self):
+        return self.__store.datetime(self.__index)
+
+    @property
+    def timestamp(self):
+        return self.__store.timestamp(self.__index)
+
+    @property
+    def priority(self):
+        return self.__store.priority(self.__index)
+
+    @property
+    def method_name(self):
+        return self.__store.method_name(self.__index)
+
+    @property
+    def method_num(self):
+        return self.__store.method_num(self.__index)
+
+    @property
+    def message(self):
+        return self.__store.message(self.__index)
+
+    @property
+    def json(self):
+        return self.__store.json(self.__index)
+
+    @json.setter
+    def json(self, value):
+        self.__store.set_json(self.__index, value)
+
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        # Only the JSON is set after the log entry is loaded.
+        if key != 'json':
+            raise TypeError(f'Log entry key is read-only: {key}')
+        self.json = value
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    def to_dict(self):
+        """
+        to_dict will return the log entry as a dict.
+
+        :return: dict log entry
+        """
+        return {key: getattr(self, key) for key in self.KEYS}
+
+
+class EventStore(object):
+    """
+    EventStore stores the log entries in columns instead of one dict per log entry. Timestamps are stored as epoch
+    seconds in an array, the priority, method name and method number as codes in a lookup table of strings, and the
+    messages in a list. Indexing the store returns an Event view of the log entry.
+
+    If parse_json is set, the JSON of the log entries is extracted from the message the first time it is read and
+    cached, including the log entries without valid JSON, so the JSON is extracted at most once per log entry.
+    """
+
+    def __init__(self, strings=None, parse_json=None):
+        """
+        Initialize class parameters.
+
+        :param strings: tuple of (list, dict) lookup table of strings to share with another EventStore
+        :param parse_json: function that takes an Event and sets its 'json', called the first time the 'json' of a log
+            entry without JSON is read
+        """
+        self.__epochs = array.array('q')
+        # __days are the codes of the raw 'month day' part of the timestamps.
+        self.__days = array.array('I')
+        self.__priorities = array.array('I')
+        self.__method_names = array.array('I')
+        self.__method_nums = array.array('I')
+        self.__messages = []
+        self.__json = []
+        self.__parse_json = parse_json
+
+        # __strings is the lookup table of the codes. __codes is the reverse lookup.
+        if strings is None:
+            strings = ([], {})
+        self.__strings, self.__codes = strings
+
+    def __len__(self):
+        return len(self.__epochs)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.__epochs)
+        if not 0 <= index < len(self.__epochs):
+            raise IndexError('EventStore index out of range')
+        return Event(self, index)
+
+    def __iter__(self):
+        for index in range(len(self.__epochs)):
+            yield Event(self, index)
+
+    def append(self, event):
+        """
+        append will add a log entry to the store.
+
+        :param event: dict log entry
+        :return: None
+        """
+        self.__epochs.append(TimestampDecoder.to_epoch(event['datetime']))
+        # The time of day is the same as in the epoch seconds. Only the 'month day' part needs to be kept.
+        self.__days.append(self.__code(event['timestamp'][:-9]))
+        self.__priorities.append(self.__code(event['priority']))
+        self.__method_names.append(self.__code(event['method_name']))
+        self.__method_nums.append(self.__code(event['method_num']))
+        self.__messages.append(event['message'])
+        if event['json'] is None and self.__parse_json is not None:
+            self.__json.append(JSON_UNPARSED)
+        else:
+            self.__json.append(event['json'])
+
+    def extend(self, events):
+        """
+        extend will add the log entries to the store.
+
+        :param events: iterable of dict log entries
+        :return: None
+        """
+        for event in events:
+            self.append(event)
+
+    def select(self, indices):
+        """
+        select will return a new store with the log entries at the indices. The lookup table is shared. Events of
+        this store stay valid.
+
+        :param indices: iterable of int indices
+        :return: EventStore
+        """
+        store = EventStore(strings=(self.__strings, self.__codes), parse_json=self.__parse_json)
+        for index in indices:
+            store.__epochs.append(self.__epochs[index])
+            store.__days.append(self.__days[index])
+            store.__priorities.append(self.__priorities[index])
+            store.__method_names.append(self.__method_names[index])
+            store.__method_nums.append(self.__method_nums[index])
+            store.__messages.append(self.__messages[index])
+            store.__json.append(self.__json[index])
+        return store
+
+    def indices(self, find=None):
+        """
+        indices will return the indices of the log entries whose priority, method_name and method_num match the
+        values in find. These are compared as codes over the whole store at once, with NumPy if it is installed. The
+        other values in find are not checked, so the log entries still need to be compared with find.
+
+        :param find: dict representing the log entries to find.
+        :return: list or range of int indices
+        """
+        columns = []
+        if isinstance(find, dict):
+            for key, column in (('priority', self.__priorities), ('method_name', self.__method_names),
+                                ('method_num', self.__method_nums)):
+                if key in find and isinstance(find[key], str):
+                    code = self.__codes.get(find[key])
+                    if code is None:
+                        # No log entry has the value.
+                        return []
+                    columns.append((column, code))
+        if not columns or not self.__epochs:
+            return range(len(self.__epochs))
+
+        numpy = numpy_module()
+        if numpy is not None:
+            mask = None
+            for column, code in columns:
+                column_mask = numpy.frombuffer(column, dtype=column.typecode) == code
+                mask = column_mask if mask is None else mask & column_mask
+            return numpy.flatnonzero(mask).tolist()
+
+        column, code = columns[0]
+        indices = [index for index, value in enumerate(column) if value == code]
+        for column, code in columns[1:]:
+            indices = [index for index in indices if column[index] == code]
+        return indices
+
+    def to_dicts(self):
+        """
+        to_dicts will return the log entries as a list of dicts, the format returned by previous versions.
+
+        :return: list of dict log entries
+        """
+        return [event.to_dict() for event in self]
+
+    def epoch(self, index):
+        return self.__epochs[index]
+
+    def datetime(self, index):
+        return TimestampDecoder.to_datetime(self.__epochs[index])
+
+    def timestamp(self, index):
+        seconds = self.__epochs[index] % 86400
+        return (f'{self.__strings[self.__days[index]]} '
+                f'{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}')
+
+    def priority(self, index):
+        return self.__strings[self.__priorities[index]]
+
+    def method_name(self, index):
+        return self.__strings[self.__method_names[index]]
+
+    def method_num(self, index):
+        return self.__strings[self.__method_nums[index]]
+
+    def message(self, index):
+        return self.__messages[index]
+
+    def json(self, index):
+        value = self.__json[index]
+        if value is JSON_UNPARSED:
+            # None until parsed, so a log entry without valid JSON is not parsed again, and the log entry can be
+            # logged while it is parsed.
+            self.__json[index] = None
+            self.__parse_json(Event(self, index))
+            value = self.__json[index]
+        return value
+
+    def set_json(self, index, value):
+        self.__json[index] = value
+
+    def __code(self, value):
+        """
+        __code will return the code of the string in the lookup table, adding it if needed.
+
+        :param value: string
+        :return: int code
+        """
+        code = self.__codes.get(value)
+        if code is None:
+            code = self.__codes[value] = len(self.__strings)
+            self.__strings.append(value)
+        return code
+
+
+class EventWindow(object):
+    """
+    EventWindow is a sliding window of the log entries for long-running processes. The log entries are appended as
+    they are read and the ones before the start of the window are evicted from the front as the window moves, so
+    memory is bounded by the length of the window however long the process runs.
+
+    The log entries are stored in a deque of EventStore chunks that share a lookup table. A chunk is dropped once its
+    last log entry is before the window. The log entries before the window in the first chunk are skipped until then.
+    Events of a dropped chunk stay valid.
+    """
+
+    def __init__(self, chunk_size=4096, parse_json=None):
+        """
+        Initialize class parameters.
+
+        :param chunk_size: int number of log entries per chunk
+        :param parse_json: function that extracts the JSON of a log entry. See EventStore.
+        """
+        self.__chunk_size = chunk_size
+        self.__parse_json = parse_json
+        self.__chunks = collections.deque()
+        self.__strings = ([], {})
+
+        # __start is the epoch seconds of the start of the window. Log entries at or before it are evicted.
+        self.__start = None
+
+        # __skip is the number of log entries before the window in the first chunk.
+        self.__skip = 0
+
+    def __len__(self):
+        return sum(len(chunk) for chunk in self.__chunks) - self.__skip
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if index < 0:
+            raise IndexError('EventWindow index out of range')
+        index += self.__skip
+        for chunk in self.__chunks:
+            if index < len(chunk):
+                return chunk[index]
+            index -= len(chunk)
+        raise IndexError('EventWindow index out of range')
+
+    def __iter__(self):
+        for chunk, indices in self.__chunk_indices():
+            for index in indices:
+                yield chunk[index]
+
+    def append(self, event):
+        """
+        append will add a log entry to the end of the window. Log entries before the window are ignored.
+
+        :param event: dict log entry
+        :return: None
+        """
+        if self.__start is not None and TimestampDecoder.to_epoch(event['datetime']) <= self.__start:
+            return None
+        if not self.__chunks or len(self.__chunks[-1]) >= self.__chunk_size:
+            self.__chunks.append(EventStore(strings=self.__strings, parse_json=self.__parse_json))
+        self.__chunks[-1].append(event)
+
+    def extend(self, events):
+        """
+        extend will add the log entries to the end of the window.
+
+        :param events: iterable of dict log entries
+        :return: None
+        """
+        for event in events:
+            self.append(event)
+
+    def evict(self, start):
+        """
+        evict will move the start of the window and evict the log entries at or before it. The log entries are in
+        chronological order, so they are evicted from the front.
+
+        :param start: int epoch seconds of the start of the window
+        :return: None
+        """
+        self.__start = start
+        while self.__chunks:
+            chunk = self.__chunks[0]
+            if chunk.epoch(len(chunk) - 1) <= start:
+                self.__chunks.popleft()
+                self.__skip = 0
+                continue
+            while chunk.epoch(self.__skip) <= start:
+                self.__skip += 1
+            break
+
+    def search(self, find=None, start=None):
+        """
+        search will return the log entries in the window whose priority, method_name and method_num match the values
+        in find. See EventStore.indices(). The log entries still need to be compared with find.
+
+        :param find: dict representing the log entries to find.
+        :param start: int epoch seconds. Only the log entries after it are returned. Defaults to the whole window.
+        :return: generator of Event log entries
+        """
+        for chunk, indices in self.__chunk_indices(find, start):
+            for index in indices:
+                yield chunk[index]
+
+    def to_dicts(self):
+        """
+        to_dicts will return the log entries as a list of dicts.
+
+        :return: list of dict log entries
+        """
+        return [event.to_dict() for event in self]
+
+    def __chunk_indices(self, find=None, start=None):
+        """
+        __chunk_indices will return the indices of the log entries in the window in each chunk.
+
+        :param find: dict representing the log entries to find, passed to EventStore.indices()
+        :param start: int epoch seconds. Only the log entries after it are returned.
+        :return: generator of (EventStore, list or range of int indices) tuples
+        """
+        for position, chunk in enumerate(self.__chunks):
+            first = self.__skip if position == 0 else 0
+            if start is not None:
+                if chunk.epoch(len(chunk) - 1) <= start:
+                    continue
+                # Binary search for the first log entry after start.
+                high = len(chunk) - 1
+                while first < high:
+                    middle = (first + high) // 2
+                    if chunk.epoch(middle) <= start:
+                        first = middle + 1
+                    else:
+                        high = middle
+            indices = chunk.indices(find)
+            if first:
+                indices = [index for index in indices if index >= first]
+            yield chunk, indices
+
+
+class CheckpointStore(object):
+    """
+    CheckpointStore will save the byte offset each log file was read up to, so the next run only reads the log entries
+    that were appended since. Log files are identified by inode and a hash of the first line instead of the filename,
+    so the checkpoint follows the file when log.txt is rotated to log.txt.1. The offsets of compressed log files are
+    in decompressed bytes, so the checkpoint also follows the file when logrotate compresses log.txt.1 to
+    log.txt.1.gz.
+    """
+
+    def __init__(self, checkpoint_file, logger=None):
+        """
+        Initialize class parameters.
+
+        :param checkpoint_file: string path to the file the checkpoints are saved in, or None to keep the checkpoints
+            in memory between loads
+        :param logger: logging instance
+        """
+        self.__checkpoint_file = checkpoint_file
+        self.__logger = logger if logger is not None else logging.getLogger()
+
+        # __checkpoints are the checkpoints saved by the last run, keyed by file identity.
+        self.__checkpoints = {}
+
+        # __seen are the checkpoints of the log files read in this run, keyed by file identity.
+        self.__seen = {}
+
+        # __identities caches the identity of the log files by path.
+        self.__identities = {}
+
+    @staticmethod
+    def file_identity(log_path):
+        """
+        file_identity will return the identity of a log file. The inode alone is not enough because inodes are
+        reused after a file is deleted. The first line of a compressed log file is hashed after it is decompressed, so
+        the hash is the same as the hash of the log file before it was compressed.
+
+        :param log_path: string path to the log file
+        :return: dict with the inode, size, hash of the first line and if the log file is compressed
+        """
+        compression = compression_type(log_path)
+        stat = os.stat(log_path)
+        with open_log_file(log_path, compression) as fh:
+            first_line = fh.readline(64 * 1024)
+        return {
+            'inode': stat.st_ino,
+            'size': stat.st_size,
+            'hash': hashlib.sha256(first_line).hexdigest(),
+            'compressed': compression is not None,
+        }
+
+    def load(self):
+        """
+        load will load the checkpoints saved by the last run. A missing or corrupt checkpoint file starts over.
+
+        :return: None
+        """
+        seen = self.__seen
+        self.__checkpoints = {}
+        self.__seen = {}
+        self.__identities = {}
+        if self.__checkpoint_file is None:
+            # The checkpoints are kept in memory. Resume from the log files read by the last load.
+            self.__checkpoints = seen
+            return None
+        if not os.path.isfile(self.__checkpoint_file):
+            return None
+        try:
+            with open(self.__checkpoint_file, mode='r', encoding='utf-8') as fh:
+                for checkpoint in json.load(fh)['files']:
+                    self.__checkpoints[(checkpoint['inode'], checkpoint['hash'])] = checkpoint
+        except (OSError, ValueError, KeyError, TypeError) as err:
+            self.__logger.warning(f'Ignoring invalid checkpoint file: {self.__checkpoint_file}: {err}')
+            self.__checkpoints = {}
+        return None
+
+    def offset(self, log_path):
+        """
+        offset will return the byte offset the log file was read up to by the last run. A compressed log file is a new
+        inode, so it is matched by the hash of the first line if its inode was not read before.
+
+        :param log_path: string path to the log file
+        :return: int byte offset, in decompressed bytes for a compressed log file. 0 if the file was not read before
+            or was truncated.
+        """
+        identity = self.__identity(log_path)
+        checkpoint = self.__checkpoints.get((identity['inode'], identity['hash']))
+        if checkpoint is None and identity['compressed']:
+            matches = [checkpoint for checkpoint in self.__checkpoints.values()
+                       if checkpoint['hash'] == identity['hash']]
+            if matches:
+                checkpoint = max(matches, key=lambda match: match['offset'])
+        if checkpoint is None:
+            return 0
+        if not identity['compressed'] and checkpoint['offset'] > identity['size']:
+            # Truncated. The size of a compressed log file is not the size of the decompressed bytes.
+            return 0
+        return checkpoint['offset']
+
+    def update(self, log_path, offset):
+        """
+        update will record the byte offset the log file was read up to.
+
+        :param log_path: string path to the log file
+        :param offset: int byte offset
+        :return: None
+        """
+        identity = self.__identity(log_path)
+        self.__seen[(identity['inode'], identity['hash'])] = {
+            'path': log_path,
+            'inode': identity['inode'],
+            'size': identity['size'],
+            'hash': identity['hash'],
+            'offset': offset,
+        }
+
+    def save(self):
+        """
+        save will save the checkpoints of the log files read in this run. The file is replaced atomically so an
+        interrupted run does not leave a partial checkpoint file.
+
+        :return: None
+        """
+        if self.__checkpoint_file is None:
+            return None
+        tmp_file = f'{self.__checkpoint_file}.tmp'
+        try:
+            with open(tmp_file, mode='w', encoding='utf-8') as fh:
+                json.dump({'files': list(self.__seen.values())}, fh, indent=2)
+            os.replace(tmp_file, self.__checkpoint_file)
+        except OSError as err:
+            self.__logger.error(f'Failed to save the checkpoint file: {self.__checkpoint_file}: {err}')
+
+    def __identity(self, log_path):
+        """
+        __identity will return the cached identity of a log file.
+
+        :param log_path: string path to the log file
+        :return: dict with the inode, size, hash of the first line and if the log file is compressed
+        """
+        if log_path not in self.__identities:
+            self.__identities[log_path] = self.file_identity(log_path)
+        return self.__identities[log_path]
+
+
+class JsonCache(object):
+    """
+    JsonCache is a bounded least recently used cache of the decoded JSON, keyed by the JSON string in the message. The
+    agent repeats the same JSON, e.g. '{"subaction": "heart_beat"}', thousands of times, so it only needs to be decoded
+    once. JSON strings that could not be decoded are cached as JSON_INVALID, so the error is only logged once.
+    """
+
+    def __init__(self, size=1024):
+        """
+        Initialize class parameters.
+
+        :param size: int maximum number of JSON strings in the cache
+        """
+        self.__size = size
+        self.__cache = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.__cache)
+
+    def get(self, json_str):
+        """
+        get will return the decoded JSON of a JSON string.
+
+        :param json_str: string JSON from the message
+        :return: decoded JSON, JSON_INVALID if the JSON string could not be decoded, or None if it is not in the cache
+        """
+        value = self.__cache.get(json_str)
+        if value is not None:
+            self.__cache.move_to_end(json_str)
+        return value
+
+    def set(self, json_str, value):
+        """
+        set will add the decoded JSON of a JSON string. The least recently used JSON string is removed if the cache is
+        full.
+
+        :param json_str: string JSON from the message
+        :param value: decoded JSON, or JSON_INVALID if the JSON string could not be decoded
+        :return: None
+        """
+        self.__cache[json_str] = value
+        self.__cache.move_to_end(json_str)
+        if len(self.__cache) > self.__size:
+            self.__cache.popitem(last=False)
+
+
+class TimeRangeCache(object):
+    """
+    TimeRangeCache will save the timestamps of the first and last log entry of each log file, so the next run knows
+    which log files overlap the 'after' window without reading them. Log files are identified by inode, size and
+    modification time. Any change to the log file makes it a new entry.
+    """
+
+    def __init__(self, cache_file, logger=None):
+        """
+        Initialize class parameters.
+
+        :param cache_file: string path to the file the time ranges are saved in
+        :param logger: logging instance
+        """
+        self.__cache_file = cache_file
+        self.__logger = logger if logger is not None else logging.getLogger()
+
+        # __time_ranges are the time ranges of the log files, keyed by file key.
+        self.__time_ranges = {}
+
+    @staticmethod
+    def file_key(stat):
+        """
+        file_key will return the key of a log file.
+
+        :param stat: os.stat_result of the log file
+        :return: tuple of (int inode, int size, int modification time in nanoseconds)
+        """
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def load(self):
+        """
+        load will load the time ranges saved by the last run. A missing or corrupt cache file starts over.
+
+        :return: None
+        """
+        self.__time_ranges = {}
+        if not os.path.isfile(self.__cache_file):
+            return None
+        try:
+            with open(self.__cache_file, mode='r', encoding='utf-8') as fh:
+                for time_range in json.load(fh)['files']:
+                    key = (time_range['inode'], time_range['size'], time_range['mtime_ns'])
+                    self.__time_ranges[key] = time_range
+        except (OSError, ValueError, KeyError, TypeError) as err:
+            self.__logger.warning(f'Ignoring invalid time range cache file: {self.__cache_file}: {err}')
+            self.__time_ranges = {}
+        return None
+
+    def get(self, stat):
+        """
+        get will return the time range of a log file.
+
+        :param stat: os.stat_result of the log file
+        :return: tuple of (int epoch seconds of the first log entry, int epoch seconds of the last log entry), or None
+            if the log file is not in the cache. The epoch seconds are None if they are not known.
+        """
+        time_range = self.__time_ranges.get(self.file_key(stat))
+        if time_range is None:
+            return None
+        return time_range['first'], time_range['last']
+
+    def set(self, log_path, stat, first, last):
+        """
+        set will record the time range of a log file.
+
+        :param log_path: string path to the log file
+        :param stat: os.stat_result of the log file
+        :param first: int epoch seconds of the first log entry, or None if not known
+        :param last: int epoch seconds of the last log entry, or None if not known
+        :return: None
+        """
+        inode, size, mtime_ns = self.file_key(stat)
+        self.__time_ranges[(inode, size, mtime_ns)] = {
+            'path': log_path,
+            'inode': inode,
+            'size': size,
+            'mtime_ns': mtime_ns,
+            'first': first,
+            'last': last,
+        }
+
+    def save(self, stats):
+        """
+        save will save the time ranges of the log files that still exist. The file is replaced atomically so an
+        interrupted run does not leave a partial cache file.
+
+        :param stats: iterable of os.stat_result of the log files
+        :return: None
+        """
+        keys = set(self.file_key(stat) for stat in stats)
+        tmp_file = f'{self.__cache_file}.tmp'
+        try:
+            with open(tmp_file, mode='w', encoding='utf-8') as fh:
+                json.dump({'files': [time_range for key, time_range in self.__time_ranges.items() if key in keys]},
+                          fh, indent=2)
+            os.replace(tmp_file, self.__cache_file)
+        except OSError as err:
+            self.__logger.error(f'Failed to save the time range cache file: {self.__cache_file}: {err}')
+
+
 class ActiveBackupLogParser(object):
     """
     ActiveBackupLogParser will consume Synology Active Backup logs, parse them and make them available for
@@ -91,7 +1352,8 @@ class ActiveBackupLogParser(object):
     """
 
     def __init__(self, after=datetime.timedelta(days=1), log_path=None, filename_glob=None,
-                 logger=None):
+                 logger=None, checkpoint_file=None, workers=None, use_mmap=False, time_range_file=None,
+                 window=False, json_backend=None, json_cache_size=None):
         """
         Initialize class parameters.
 
@@ -99,6 +1361,21 @@ class ActiveBackupLogParser(object):
         :param log_path: string path to the log files
         :param filename_glob: string filename glob pattern for the log files
         :param logger: logging instance
+        :param checkpoint_file: string path to a file to save the read position in. If set, load() only returns the
+            log entries that were appended since the last load().
+        :param workers: int number of worker processes used to parse the log files in parallel. Small loads are
+            parsed in this process because starting the workers would take longer.
+        :param use_mmap: bool True to memory map the log files and match the log entries on the bytes. Only the log
+            entries after the time delta are decoded.
+        :param time_range_file: string path to a file to cache the timestamps of the first and last log entry of each
+            log file in. If set, log files that do not overlap the time delta are not read.
+        :param window: bool True to keep the log entries in a sliding window of the time delta for long-running
+            processes. Each load() adds the log entries written since the last load() and evicts the log entries that
+            are no longer in the time delta. search() does not remove log entries from the window.
+        :param json_backend: string name of the JSON module to decode the JSON in the log entries with, one of
+            JSON_BACKENDS. Defaults to the fastest JSON module installed.
+        :param json_cache_size: int number of JSON strings to keep decoded in a JsonCache. Log entries with the same
+            JSON share the decoded JSON, so it must not be modified. Disabled by default.
         """
 
         # Logging framework
@@ -131,21 +1408,88 @@ class ActiveBackupLogParser(object):
         # TODO: Should the timezone be used when calculating the timestamp?
         self.__re_log_entry = re.compile(r'^(?P<month>\w{3}) (?P<day>\d+) (?P<time>[\d:]{8}) (?P<timezone>[\d-]{5,})? ?\[(?P<priority>\w+)] (?P<method_name>[\w.-]+) \((?P<method_num>\d+)\): ?(?P<message>.*)$')
 
+        # __re_log_entry_bytes is __re_log_entry for matching the log entries on the bytes of a memory mapped file.
+        # It also matches the first line after the BOM.
+        self.__re_log_entry_bytes = re.compile(
+            rb'(?:^|(?<=\A\xef\xbb\xbf))' + self.__re_log_entry.pattern[1:].encode('utf-8'), re.MULTILINE)
+
         # __now is a timestamp used to determine if the log entry is after "now". 1 minute is added for
         # processing time.
         self.__now = datetime.datetime.now() + datetime.timedelta(minutes=1)
 
-        # __current_year is the current year and used to determine if the log entry is for this year or last year.
-        # The logs do not contain the year.
-        self.__current_year = self.__now.year
+        # __timestamps converts the log timestamps to epoch seconds. The logs do not contain the year. The year of
+        # __now is used to determine if the log entry is for this year or last year.
+        self.__timestamps = TimestampDecoder(self.__now)
 
         # __after is a timestamp used to calculate if the log should be included in the search.
         # Default: 1 day
         if after:
             self.__after = after
+            self.__after_epoch = TimestampDecoder.to_epoch(self.__now - self.__after)
+
+        # __events is the store of the log entries. The JSON is extracted from the message when it is first read.
+        self.__events = EventStore(parse_json=self.__parse_event_json)
+
+        # __checkpoints saves the byte offset read up to in each log file. Disabled by default.
+        self.__checkpoints = None
+        if checkpoint_file:
+            self.__checkpoints = CheckpointStore(checkpoint_file, logger=self.__logger)
+
+        # __workers is the number of worker processes to parse the log files with. Disabled by default.
+        self.__workers = workers
+
+        # __window keeps the log entries in a sliding window of the time delta. Disabled by default. The checkpoints
+        # are kept in memory if a checkpoint file isn't used, so each load() only reads the new log entries.
+        self.__window = window
+        if self.__window:
+            self.__events = EventWindow(parse_json=self.__parse_event_json)
+            if self.__checkpoints is None:
+                self.__checkpoints = CheckpointStore(None, logger=self.__logger)
+
+        # __use_mmap enables memory mapping the log files. Disabled by default.
+        self.__use_mmap = use_mmap
 
-        # __events is an array of the log entries.
-        self.__events = []
+        # __compressions caches the compression of each log file by path.
+        self.__compressions = {}
+
+        # __time_ranges caches the time range of each log file. Disabled by default.
+        self.__time_ranges = None
+        if time_range_file:
+            self.__time_ranges = TimeRangeCache(time_range_file, logger=self.__logger)
+
+        # __json_loads is the loads() function of the JSON module, or None for the standard library.
+        json_name, self.__json_loads = find_json_backend(json_backend)
+        if json_name != 'json' and self.__json_loads is None:
+            self.__logger.warning(f'The {json_name} module is not installed. Using the json module.')
+        self.__logger.debug(f'Decoding JSON with the {json_name} module')
+
+        # __json_cache caches the decoded JSON by the JSON string. Disabled by default.
+        self.__json_cache = None
+        if json_cache_size:
+            self.__json_cache = JsonCache(json_cache_size)
+
+    def __advance_now(self):
+        """
+        __advance_now will move "now" and the start of the 'after' window to the current time. Used by long-running
+        processes.
+
+        :return: None
+        """
+        self.__now = datetime.datetime.now() + datetime.timedelta(minutes=1)
+        self.__timestamps.advance(self.__now)
+        self.__after_epoch = TimestampDecoder.to_epoch(self.__now - self.__after)
+
+    def __getstate__(self):
+        """
+        __getstate__ is used when the parser is sent to the worker processes. The loaded log entries are not sent.
+
+        :return: dict state of the parser
+        """
+        state = self.__dict__.copy()
+        state['_ActiveBackupLogParser__events'] = EventStore()
+        # The workers don't extract the JSON.
+        state['_ActiveBackupLogParser__json_cache'] = None
+        return state
 
     def load(self):
         """
@@ -153,18 +1497,229 @@ class ActiveBackupLogParser(object):
 
         :return: None
         """
+        if self.__window:
+            self.__evict()
+        self.__events.extend(self.iter_events())
+        return None
+
+    def append(self, event):
+        """
+        append will add a log entry to the loaded log entries, e.g. a log entry from follow().
+
+        :param event: dict log entry
+        :return: None
+        """
+        if self.__window:
+            self.__evict()
+        self.__events.append(event)
+
+    def __evict(self):
+        """
+        __evict will move the sliding window to the current time and evict the log entries that are no longer in it.
+
+        :return: None
+        """
+        self.__advance_now()
+        self.__events.evict(self.__after_epoch)
+
+    def log_files(self):
+        """
+        log_files will return the log files in the path that were modified after the time delta to search for.
+        The files are sorted by modification time, oldest first.
+
+        :return: list of file paths
+        """
+        return [file for file, _ in self.__log_file_stats()]
+
+    def __log_file_stats(self):
+        """
+        __log_file_stats will return the log files in the path that were modified after the time delta to search for,
+        with the result of os.stat(). Each file is only stat'ed once.
+
+        :return: list of (string file path, os.stat_result) tuples, oldest first
+        """
         if not os.path.isdir(self.__log_path):
             self.__logger.error(f'Error: Log directory does not exist: {self.__log_path}')
-            return None
+            return []
 
-        files = glob.glob(os.path.join(self.__log_path, self.__log_filename_glob))
-        files.sort(key=os.path.getmtime)
-        for file in files:
-            if datetime.datetime.fromtimestamp(os.path.getmtime(file)) > datetime.datetime.now() - self.__after:
-                self.__logger.debug(f'Processing log file: {file}')
-                self.load_log_file(file)
+        stats = []
+        for file in glob.glob(os.path.join(self.__log_path, self.__log_filename_glob)):
+            try:
+                stats.append((file, os.stat(file)))
+            except OSError as err:
+                # The file was rotated away after glob() found it.
+                self.__logger.debug(f'Skipping log file: {file}: {err}')
+        stats.sort(key=lambda file_stat: file_stat[1].st_mtime)
+        after = datetime.datetime.now() - self.__after
+        return [(file, stat) for file, stat in stats if datetime.datetime.fromtimestamp(stat.st_mtime) > after]
 
-        return None
+    def iter_events(self):
+        """
+        iter_events is a generator that yields the log entries after the time delta one at a time. The log files are
+        read line by line and multiline entries are assembled before the entry is yielded, so only one entry is held
+        in memory at a time. Multiline entries that span two log files are joined.
+
+        If checkpoints are enabled, reading resumes where the last run stopped and the checkpoints are saved once
+        the generator is exhausted.
+
+        :return: generator of dict log entries
+        """
+        self.__compressions = {}
+        if self.__checkpoints is not None:
+            self.__checkpoints.load()
+        if self.__time_ranges is not None:
+            self.__time_ranges.load()
+
+        # Find where the 'after' window starts by scanning the newest files backwards. Files older than the file
+        # that contains the start of the window are not read at all.
+        stats = self.__log_file_stats()
+        plan = []
+        for file, stat in reversed(stats):
+            if self.__compression_type(file) == 'zstd' and zstandard_module() is None:
+                self.__logger.warning(f'Skipping zstd compressed log file, the zstandard module is not installed: {file}')
+                continue
+            floor = 0
+            if self.__checkpoints is not None:
+                floor = self.__checkpoints.offset(file)
+            if self.__time_ranges is not None and floor == 0:
+                offset, found = self.__find_cached_start_offset(file, stat)
+            else:
+                offset, found = self.__find_start_offset(file, floor)
+            if offset < stat.st_size or self.__checkpoints is not None:
+                # Log files without log entries in the 'after' window are only opened to update the checkpoint.
+                plan.append((file, offset))
+            if found:
+                break
+        plan.reverse()
+
+        if self.__time_ranges is not None:
+            self.__time_ranges.save(stat for _, stat in stats)
+
+        yield from self.__iter_plan(plan)
+
+        if self.__checkpoints is not None:
+            self.__checkpoints.save()
+
+    def __iter_plan(self, plan):
+        """
+        __iter_plan will parse the log files in the plan, in worker processes if it is worth it.
+
+        :param plan: list of (string path to the log file, int byte offset to start reading from) tuples, oldest first
+        :return: generator of dict log entries
+        """
+        # Minimum number of bytes to read before starting the worker processes is worth it.
+        min_size = 8 * 1024 * 1024
+        if self.__workers and self.__workers > 1:
+            # The offsets of compressed log files are in decompressed bytes, so this is an estimate.
+            size = sum(max(0, os.path.getsize(file) - offset) for file, offset in plan)
+            if size >= min_size:
+                return self.__iter_parallel(self.__shard(plan, size))
+
+        if self.__use_mmap and not any(self.__compression_type(file) for file, _ in plan):
+            return self.__iter_mmap_entries([(file, offset, None) for file, offset in plan])
+
+        lines = (line for file, offset in plan for line in self.__iter_log_lines(file, offset))
+        return self.__iter_entries(lines)
+
+    def __shard(self, plan, size):
+        """
+        __shard will split the log files into byte ranges to parse in the worker processes. Large log files are split
+        so a single large log file can be parsed in parallel. The ranges start at a line that starts a log entry, so
+        multiline log entries are not split.
+
+        :param plan: list of (string path to the log file, int byte offset to start reading from) tuples, oldest first
+        :param size: int total number of bytes to read
+        :return: list of (string path to the log file, int start byte offset, int end byte offset) tuples, oldest
+            first. The end is None for the end of the file.
+        """
+        # Minimum size of a byte range.
+        min_shard_size = 4 * 1024 * 1024
+        shard_size = max(min_shard_size, size // self.__workers)
+        shards = []
+        for file, offset in plan:
+            start = offset
+            if self.__compression_type(file) is not None:
+                # Compressed log files can only be read from the start.
+                shards.append((file, start, None))
+                continue
+            with open(file, mode='rb') as fh:
+                file_size = fh.seek(0, os.SEEK_END)
+                while file_size - start > shard_size:
+                    probe = self.__probe(fh, start + shard_size, file_size)
+                    if probe is None:
+                        break
+                    shards.append((file, start, probe[0]))
+                    start = probe[0]
+            shards.append((file, start, None))
+        return shards
+
+    def __iter_parallel(self, shards):
+        """
+        __iter_parallel is a generator that parses byte ranges of the log files in worker processes, one byte range
+        per task, and yields the log entries in order. Lines at the top of a log file are joined to the last log
+        entry of the previous log file.
+
+        :param shards: list of (string path to the log file, int start byte offset, int end byte offset) tuples
+        :return: generator of dict log entries
+        """
+        self.__logger.debug(f'Parsing {len(shards)} byte ranges with {self.__workers} workers')
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.__workers) as executor:
+            futures = [executor.submit(self.parse_log_file, file, start, end) for file, start, end in shards]
+            # The last log entry is held back until the next byte range is parsed because it may continue there.
+            event = None
+            for (file, _, _), future in zip(shards, futures):
+                result = future.result()
+                if result['continuation'] and event is not None:
+                    event['message'] += result['continuation']
+                if result['events']:
+                    if event is not None:
+                        yield event
+                    yield from result['events'][:-1]
+                    event = result['events'][-1]
+                if result['open'] is False:
+                    # The last log entry in the file is before the 'after' window.
+                    if event is not None:
+                        yield event
+                    event = None
+                if self.__checkpoints is not None:
+                    self.__checkpoints.update(file, result['offset'])
+            if event is not None:
+                yield event
+
+    def parse_log_file(self, log_path, offset=0, end=None):
+        """
+        parse_log_file will parse the log entries after the time delta in a log file. This is what the worker
+        processes run. The lines before the first log entry belong to the last log entry of the previous log file, so
+        they are returned separately to be joined by the caller.
+
+        :param log_path: string path to the log file
+        :param offset: int byte offset to start reading from
+        :param end: int byte offset to stop reading at. Defaults to the end of the file.
+        :return: dict with the 'continuation' string of lines before the first log entry, the list of 'events',
+            'open' true if the last log entry is after the time delta (None if there are no log entries) and the
+            'offset' the file was read up to
+        """
+        state = {'continuation': [], 'open': None, 'offset': offset}
+        if self.__use_mmap and self.__compression_type(log_path) is None:
+            events = list(self.__iter_mmap_entries([(log_path, offset, end)], state))
+        else:
+            events = list(self.__iter_entries(self.__iter_log_lines(log_path, offset, state, end), state))
+        return {
+            'continuation': ''.join(state['continuation']),
+            'events': events,
+            'open': state['open'],
+            'offset': state['offset'],
+        }
+
+    def iter_log_file(self, log_path):
+        """
+        iter_log_file is a generator that yields the log entries in a single log file after the time delta.
+
+        :param log_path: string path to the log file
+        :return: generator of dict log entries
+        """
+        offset, _ = self.__find_start_offset(log_path)
+        return self.__iter_plan([(log_path, offset)])
 
     def load_log_file(self, log_path):
         """
@@ -173,116 +1728,705 @@ class ActiveBackupLogParser(object):
         :param log_path: string path to the log files
         :return: None
         """
+        self.__events.extend(self.iter_log_file(log_path))
+
+    def __compression_type(self, log_path):
+        """
+        __compression_type will return the cached compression of a log file.
+
+        :param log_path: string path to the log file
+        :return: string compression returned by compression_type()
+        """
+        if log_path not in self.__compressions:
+            self.__compressions[log_path] = compression_type(log_path)
+        return self.__compressions[log_path]
+
+    def __find_start_offset(self, log_path, floor=0):
+        """
+        __find_start_offset will find the byte offset of the first log entry after the time delta. The log entries are
+        in chronological order, so the file is read backwards from the end until an entry before the 'after' window is
+        found. A short time delta only reads the tail of the file. If the start of the window is further back than
+        the tail, it is found with a binary search on the byte offsets.
+
+        :param log_path: string path to the log file
+        :param floor: int byte offset that was already read by a previous run. The file is not read before it.
+        :return: tuple of (int byte offset, bool True if the log entries before the offset do not need to be read)
+        """
+        compression = self.__compression_type(log_path)
+        if compression is not None:
+            return self.__find_compressed_start_offset(log_path, compression, floor)
+
+        after = self.__after_epoch
+        # Number of bytes at the end of the file that are read backwards before switching to a binary search.
+        tail_size = 256 * 1024
+        with open(log_path, mode='rb') as fh:
+            size = fh.seek(0, os.SEEK_END)
+            if floor == 0:
+                first = self.__probe(fh, 0, size)
+                if first is None or first[1] > after:
+                    # The entire file is in the 'after' window. Continuation lines at the top of the file belong to
+                    # the last log entry of the previous file.
+                    return 0, False
+
+            start = size
+            low = size
+            for offset, line in reverse_lines(fh, size):
+                if offset < floor:
+                    # Already read by a previous run.
+                    return start, True
+                if size - offset > tail_size:
+                    break
+                low = offset
+                ts_match = self.__re_log_entry.match(self.__decode_line(line, offset, errors='replace'))
+                if not ts_match:
+                    # Multiline log entry
+                    continue
+                if self.__entry_epoch(ts_match) <= after:
+                    # Log timestamp is before the 'after' window. Everything before it is too.
+                    return start, True
+                start = offset
+            else:
+                return start, True
+
+            # The start of the 'after' window is before the tail of the file.
+            return self.__bisect_start_offset(fh, floor, low, start, after), True
+
+    def __find_cached_start_offset(self, log_path, stat):
+        """
+        __find_cached_start_offset is __find_start_offset() using the time range cache. Log files that are entirely in
+        the 'after' window or entirely before it are not read. The time range of a log file that is not in the cache
+        is read from the first and last log entry.
+
+        :param log_path: string path to the log file
+        :param stat: os.stat_result of the log file
+        :return: tuple of (int byte offset, bool True if the log entries before the offset do not need to be read)
+        """
+        time_range = self.__time_ranges.get(stat)
+        if time_range is None:
+            time_range = self.__read_time_range(log_path)
+            self.__time_ranges.set(log_path, stat, *time_range)
+
+        first, last = time_range
+        if first is None or first > self.__after_epoch:
+            # The entire file is in the 'after' window.
+            return 0, False
+        if last is not None and last <= self.__after_epoch:
+            # The entire file is before the 'after' window.
+            return stat.st_size, True
+        return self.__find_start_offset(log_path)
+
+    def __read_time_range(self, log_path):
+        """
+        __read_time_range will read the timestamps of the first and last log entry of a log file. The last log entry
+        of a compressed log file is not read because the entire file would need to be decompressed.
+
+        :param log_path: string path to the log file
+        :return: tuple of (int epoch seconds of the first log entry, int epoch seconds of the last log entry). The
+            epoch seconds are None if there are no log entries or they are not known.
+        """
+        compression = self.__compression_type(log_path)
+        if compression is not None:
+            with open_log_file(log_path, compression) as fh:
+                return self.__first_entry_epoch(fh), None
+
+        with open(log_path, mode='rb') as fh:
+            size = fh.seek(0, os.SEEK_END)
+            first = self.__probe(fh, 0, size)
+            if first is None:
+                return None, None
+            for offset, line in reverse_lines(fh, size):
+                ts_match = self.__re_log_entry.match(self.__decode_line(line, offset, errors='replace'))
+                if ts_match:
+                    return first[1], self.__entry_epoch(ts_match)
+        return first[1], None
+
+    def __find_compressed_start_offset(self, log_path, compression, floor=0):
+        """
+        __find_compressed_start_offset is __find_start_offset() for compressed log files. A compressed log file can't
+        be read backwards, so it is read from the start. Only the first log entry is decompressed to find out if the
+        start of the 'after' window is in this file.
+
+        :param log_path: string path to the log file
+        :param compression: string compression returned by compression_type()
+        :param floor: int offset in the decompressed bytes that was already read by a previous run
+        :return: tuple of (int offset in the decompressed bytes, bool True if the log entries before the offset do not
+            need to be read)
+        """
+        if floor > 0:
+            # Read up to the floor by a previous run, maybe before the log file was compressed.
+            return floor, True
+
+        with open_log_file(log_path, compression) as fh:
+            first = self.__first_entry_epoch(fh)
+        return 0, first is not None and first <= self.__after_epoch
+
+    def __first_entry_epoch(self, fh):
+        """
+        __first_entry_epoch will read a log file forward until the first log entry. Used for compressed log files that
+        can't seek.
+
+        :param fh: binary file handle at the start of the file
+        :return: int epoch seconds of the first log entry, or None if there are no log entries
+        """
+        offset = 0
+        for line in fh:
+            ts_match = self.__re_log_entry.match(self.__decode_line(line, offset, errors='replace'))
+            if ts_match:
+                return self.__entry_epoch(ts_match)
+            offset += len(line)
+        return None
+
+    def __bisect_start_offset(self, fh, low, high, start, after):
+        """
+        __bisect_start_offset will find the byte offset of the first log entry after the 'after' timestamp with a
+        binary search. Each probe seeks to the middle of the range and re-syncs to the next line that starts a log
+        entry.
+
+        :param fh: binary file handle
+        :param low: int byte offset of a line start. The log entries before it are before the 'after' window.
+        :param high: int byte offset. The log entries between high and start are after the 'after' window.
+        :param start: int byte offset of the first log entry known to be after the 'after' window
+        :param after: int epoch seconds of the start of the 'after' window
+        :return: int byte offset
+        """
+        # Stop bisecting when the range is small enough to read.
+        min_range = 64 * 1024
+        while high - low > min_range:
+            middle = (low + high) // 2
+            probe = self.__probe(fh, middle, high)
+            if probe is None:
+                # There are no log entries between middle and high.
+                high = middle
+            elif probe[1] <= after:
+                low = probe[0] + probe[2]
+            else:
+                start = probe[0]
+                high = probe[0]
+
+        # Read the remaining range forward.
+        while True:
+            probe = self.__probe(fh, low, high)
+            if probe is None:
+                return start
+            if probe[1] > after:
+                return probe[0]
+            low = probe[0] + probe[2]
+
+    def __probe(self, fh, offset, end):
+        """
+        __probe will find the first log entry that starts at or after the byte offset. If the offset is in the middle
+        of a line, the rest of the line is skipped.
+
+        :param fh: binary file handle
+        :param offset: int byte offset
+        :param end: int byte offset to stop searching at
+        :return: tuple of (int byte offset, int epoch seconds, int length of the line) of the log entry,
+            or None if no log entry starts before end
+        """
+        if offset > 0:
+            fh.seek(offset - 1)
+            fh.readline()
+        else:
+            fh.seek(0)
+        position = fh.tell()
+        while position < end:
+            line = fh.readline()
+            if not line:
+                break
+            ts_match = self.__re_log_entry.match(self.__decode_line(line, position, errors='replace'))
+            if ts_match:
+                return position, self.__entry_epoch(ts_match), len(line)
+            position += len(line)
+        return None
+
+    def __iter_log_lines(self, log_path, offset=0, state=None, end=None):
+        """
+        __iter_log_lines is a generator that yields the lines of a log file.
+
+        :param log_path: string path to the log file
+        :param offset: int byte offset to start reading from
+        :param state: dict to return the byte offset the file was read up to in 'offset'
+        :param end: int byte offset of a line start to stop reading at. Defaults to the end of the file.
+        :return: generator of string lines
+        """
+        compression = self.__compression_type(log_path)
+        if compression is not None:
+            yield from self.__iter_compressed_lines(log_path, compression, offset, state)
+            return
+
+        self.__logger.debug(f'Processing log file: {log_path} from byte {offset}')
+        # The file is read in binary mode so the byte offsets can be used to seek.
+        with open(log_path, mode='rb') as fh:
+            fh.seek(offset)
+            for line in fh:
+                if end is not None and offset >= end:
+                    break
+                if self.__checkpoints is not None and not line.endswith(b'\n'):
+                    # The last line is still being written. Leave it for the next run.
+                    break
+                yield self.__decode_line(line, offset)
+                offset += len(line)
+
+        if state is not None:
+            state['offset'] = offset
+        if self.__checkpoints is not None:
+            self.__checkpoints.update(log_path, offset)
+
+    def __iter_compressed_lines(self, log_path, compression, offset=0, state=None):
+        """
+        __iter_compressed_lines is a generator that yields the lines of a compressed log file. The file is
+        decompressed while it is read. The byte offsets are offsets in the decompressed bytes, which are the byte
+        offsets of the log file before it was compressed. The lines before the offset are decompressed and skipped.
+
+        :param log_path: string path to the log file
+        :param compression: string compression returned by compression_type()
+        :param offset: int offset in the decompressed bytes to start reading from
+        :param state: dict to return the offset in the decompressed bytes the file was read up to in 'offset'
+        :return: generator of string lines
+        """
+        self.__logger.debug(f'Processing {compression} compressed log file: {log_path} from byte {offset}')
+        position = 0
+        with open_log_file(log_path, compression) as fh:
+            for line in fh:
+                if position >= offset:
+                    yield self.__decode_line(line, position)
+                position += len(line)
+
+        if state is not None:
+            state['offset'] = position
+        if self.__checkpoints is not None:
+            self.__checkpoints.update(log_path, position)
+
+    @staticmethod
+    def __decode_line(line, offset, errors='strict'):
+        """
+        __decode_line will decode a line of the log file.
+
+        :param line: bytes line
+        :param offset: int byte offset of the line in the file
+        :param errors: string error handling scheme passed to bytes.decode()
+        :return: string line
+        """
         # Use the correct encoding.
         # https://stackoverflow.com/questions/17912307/u-ufeff-in-python-string/17912811#17912811
         #   Note that EF BB BF is a UTF-8-encoded BOM. It is not required for UTF-8, but serves only as a
         #   signature (usually on Windows).
-        with open(log_path, mode='r', encoding='utf-8-sig') as fh:
-            for line in fh.readlines():
-                ts_match = self.__re_log_entry.match(line)
-                if ts_match:
-                    # New log entry
-                    # Check if the timestamp is before the threshold
-                    # TODO: Use f-strings
-                    # ts = datetime.datetime.strptime('{year} {month} {day} {time}'.format(
-                    #     month=ts_match.group('month'),
-                    #     day=ts_match.group('day'),
-                    #     time=ts_match.group('time'),
-                    #     year=self.__current_year,
-                    # ), '%Y %b %d %X')
-                    ts = datetime.datetime.strptime(
-                        f'{self.__current_year} {ts_match.group("month")} {ts_match.group("day")} {ts_match.group("time")}',
-                        '%Y %b %d %X')
-                    if self.__now < ts:
-                        # Log timestamp is in the future indicating the log entry is from last year. Subtract one year.
-                        # FIXME: This does not take into account leap years. It may be off 1 day on leap years.
-                        ts = ts - datetime.timedelta(days=365)
-
-                    if self.__now - self.__after < ts:
-                        # Log timestamp is after the 'after' timestamp. Include it.
-                        # Always include the timestamp
-                        self.__events.append({
-                            'datetime': ts,
-                            'timestamp': f'{ts_match["month"]} {ts_match["day"]} {ts_match["time"]}',
-                            'priority': ts_match['priority'],
-                            'method_name': ts_match['method_name'],
-                            'method_num': ts_match['method_num'],
-                            'message': ts_match['message'].strip(),
-                            'json': None,
-                        })
+        if offset == 0:
+            return line.decode('utf-8-sig', errors=errors)
+        return line.decode('utf-8', errors=errors)
+
+    def __iter_entries(self, lines, state=None):
+        """
+        __iter_entries is a generator that assembles the lines into log entries and yields the entries after the
+        time delta. An entry is yielded once the next entry starts, because until then more lines may belong to it.
+
+        :param lines: iterable of string lines
+        :param state: dict to return the lines before the first log entry in 'continuation' and if the last log entry
+            is after the time delta in 'open'. Used to join log entries that were parsed separately.
+        :return: generator of dict log entries
+        """
+        event = None
+        for line in lines:
+            ts_match = self.__re_log_entry.match(line)
+            if ts_match:
+                # New log entry
+                if event is not None:
+                    yield event
+                event = self.__new_event(ts_match)
+                if state is not None:
+                    state['open'] = event is not None
 
+            elif event is not None:
+                # Multiline log entry; append to last line
+                event['message'] += line.strip()
+
+            elif state is not None and state['open'] is None:
+                # Lines before the first log entry
+                state['continuation'].append(line.strip())
+
+            # else: Log timestamp was before the 'after' window and nothing is captured yet.
+
+        if event is not None:
+            yield event
+
+    def __iter_mmap_entries(self, ranges, state=None):
+        """
+        __iter_mmap_entries is the memory mapped version of __iter_entries(). The log files are memory mapped and
+        the log entries are matched on the bytes, so the lines are not copied or decoded. Only the fields of the log
+        entries after the time delta are decoded. Multiline entries that span two log files are joined.
+
+        :param ranges: list of (string path to the log file, int start byte offset, int end byte offset) tuples. The
+            end is None for the end of the file.
+        :param state: dict to return the lines before the first log entry in 'continuation', if the last log entry is
+            after the time delta in 'open' and the byte offset the file was read up to in 'offset'.
+        :return: generator of dict log entries
+        """
+        event = None
+        for log_path, offset, end in ranges:
+            self.__logger.debug(f'Processing log file: {log_path} from byte {offset} (mmap)')
+            with open(log_path, mode='rb') as fh:
+                size = fh.seek(0, os.SEEK_END)
+                if end is None or end > size:
+                    end = size
+                if offset >= end:
+                    buffer = b''
                 else:
-                    # Multiline log entry; append to last line
-                    if len(self.__events) == 0:
-                        # Log timestamp was before the 'after' window and nothing is captured yet.
-                        continue
-                    self.__events[len(self.__events) - 1]['message'] += line.strip()
+                    buffer = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    if self.__checkpoints is not None and end > offset and buffer[end - 1:end] != b'\n':
+                        # The last line is still being written. Leave it for the next run.
+                        end = buffer.rfind(b'\n', offset, end) + 1 or offset
+                    position = offset
+                    if offset == 0 and buffer[:len(codecs.BOM_UTF8)] == codecs.BOM_UTF8:
+                        # Skip the BOM like the 'utf-8-sig' decoding of the first line does, also when the first line
+                        # continues the last log entry of the previous file.
+                        position = len(codecs.BOM_UTF8)
+                    for ts_match in self.__re_log_entry_bytes.finditer(buffer, offset, end):
+                        if ts_match.start() > position:
+                            # Multiline log entry; append to last line
+                            if event is not None:
+                                event['message'] += self.__join_lines(buffer[position:ts_match.start()])
+                            elif state is not None and state['open'] is None:
+                                # Lines before the first log entry
+                                state['continuation'].append(self.__join_lines(buffer[position:ts_match.start()]))
+                        # New log entry
+                        if event is not None:
+                            yield event
+                        event = self.__new_event_bytes(ts_match)
+                        if state is not None:
+                            state['open'] = event is not None
+                        position = ts_match.end() + 1
+                    if end > position:
+                        if event is not None:
+                            event['message'] += self.__join_lines(buffer[position:end])
+                        elif state is not None and state['open'] is None:
+                            state['continuation'].append(self.__join_lines(buffer[position:end]))
+                finally:
+                    if isinstance(buffer, mmap.mmap):
+                        buffer.close()
+
+            if state is not None:
+                state['offset'] = end
+            if self.__checkpoints is not None:
+                self.__checkpoints.update(log_path, end)
+
+        if event is not None:
+            yield event
+
+    @staticmethod
+    def __join_lines(data):
+        """
+        __join_lines will join the lines of a multiline log entry the same way as the lines are appended when
+        reading line by line.
+
+        :param data: bytes lines
+        :return: string joined lines
+        """
+        return ''.join(line.strip() for line in data.decode('utf-8').split('\n'))
+
+    def __new_event_bytes(self, ts_match):
+        """
+        __new_event_bytes will create the log entry for a match of __re_log_entry_bytes. The fields are only decoded
+        if the log entry is after the time delta.
+
+        :param ts_match: re.Match of __re_log_entry_bytes
+        :return: dict log entry, or None if the entry is before the 'after' window
+        """
+        month = ts_match['month'].decode('utf-8')
+        day = ts_match['day'].decode('utf-8')
+        time = ts_match['time'].decode('utf-8')
+        ts = self.__timestamps.epoch(month, day, time)
+        if ts <= self.__after_epoch:
+            return None
+
+        return {
+            'datetime': self.__timestamps.to_datetime(ts),
+            'timestamp': f'{month} {day} {time}',
+            'priority': ts_match['priority'].decode('utf-8'),
+            'method_name': ts_match['method_name'].decode('utf-8'),
+            'method_num': ts_match['method_num'].decode('utf-8'),
+            'message': ts_match['message'].decode('utf-8').strip(),
+            'json': None,
+        }
+
+    def __new_event(self, ts_match):
+        """
+        __new_event will create the log entry for a line matching __re_log_entry.
+
+        :param ts_match: re.Match of __re_log_entry
+        :return: dict log entry, or None if the entry is before the 'after' window
+        """
+        # Check if the timestamp is before the threshold
+        ts = self.__entry_epoch(ts_match)
+        if ts <= self.__after_epoch:
+            return None
+
+        # Log timestamp is after the 'after' timestamp. Include it.
+        # Always include the timestamp
+        return {
+            'datetime': self.__timestamps.to_datetime(ts),
+            'timestamp': f'{ts_match["month"]} {ts_match["day"]} {ts_match["time"]}',
+            'priority': ts_match['priority'],
+            'method_name': ts_match['method_name'],
+            'method_num': ts_match['method_num'],
+            'message': ts_match['message'].strip(),
+            'json': None,
+        }
+
+    def __entry_epoch(self, ts_match):
+        """
+        __entry_epoch will calculate the timestamp of a log entry in epoch seconds.
+
+        :param ts_match: re.Match of __re_log_entry
+        :return: int epoch seconds of the log entry
+        """
+        return self.__timestamps.epoch(ts_match['month'], ts_match['day'], ts_match['time'])
 
     def parse_json(self, index):
         """
-        parse_json will extract the JSON strings from the message and store them in "json".
+        parse_json will extract the JSON strings from the message and store them in "json". The JSON of the loaded log
+        entries is extracted when "json" is first read, so this is only needed to extract it ahead of time.
 
         :param index: int index of entry to parse
         :return: None
         """
+        self.__events[index].json
+
+    def __parse_event_json(self, event):
+        """
+        __parse_event_json will extract the JSON strings from the message of the event and store them in "json".
+
+        :param event: dict log entry
+        :return: None
+        """
         # Ignore strings that look like JSON but aren't. This is to prevent false JSON parsing errors.
-        re_ignore_list = [
-            re.compile(r'getVolumeDetailInfo for .*Volume'),
-            re.compile(r'Snapshot: \{'),
-            re.compile(r'Create snapshot for'),
-        ]
-        for regex in re_ignore_list:
-            matches = re.search(regex, self.__events[index]['message'])
-            if matches:
-                # Fake JSON found. Don't continue the search.
-                self.__logger.debug(f'Ignoring fake JSON: {self.__events[index]["message"]}')
-                return
+        if RE_FAKE_JSON.search(event['message']):
+            # Fake JSON found. Don't continue the search.
+            self.__logger.debug(f'Ignoring fake JSON: {event["message"]}')
+            return
 
         # If the message has what looks like JSON, extract it from the payload.
-        re_list = [
-            re.compile(r"'(?P<json>{.*})'"),
-            re.compile(r'([^{]*)(?P<json>\{".*})(.*)'),
-        ]
-        for regex in re_list:
-            matches = re.search(regex, self.__events[index]['message'])
-            if matches:
-
-                # Fix single quotes
-                # Fix commas without values
-                json_str = fix_simple(fix_single_quotes(matches['json']))
-                try:
-                    self.__events[index]['json'] = json.loads(json_str, strict=False)
-                    # self.__logger.debug('JSON Object:', self.__events[index]['json'])
-                    # Valid JSON found. Don't need to look for more.
+        for candidate in json_candidates(event['message']):
+            if self.__json_cache is not None:
+                cached = self.__json_cache.get(candidate)
+                if cached is JSON_INVALID:
+                    # The error was logged when it was decoded.
+                    continue
+                if cached is not None:
+                    event['json'] = cached
                     return
-                except json.decoder.JSONDecodeError as err:
-                    self.__logger.error('=====')
-                    self.__logger.error('ERR: Failed to parse JSON from message')
-                    self.__logger.error('Input JSON string:')
-                    self.__logger.error(json_str)
-                    self.__logger.error('Input log string:')
-                    self.__logger.error(self.__events[index]['message'])
-                    self.__logger.error(self.__events[index])
-                    self.__logger.error(err)
-                    self.__logger.error(traceback.format_exc())
-                    self.__logger.error('-----')
-
-    def search(self, find):
+
+            # Fix single quotes, commas without values and backslashes
+            json_str = repair_json(candidate)
+            try:
+                event['json'] = decode_json(json_str, self.__json_loads)
+                # self.__logger.debug('JSON Object:', event['json'])
+                # Valid JSON found. Don't need to look for more.
+                if self.__json_cache is not None:
+                    self.__json_cache.set(candidate, event['json'])
+                return
+            except json.decoder.JSONDecodeError as err:
+                if self.__json_cache is not None:
+                    self.__json_cache.set(candidate, JSON_INVALID)
+                self.__logger.error('=====')
+                self.__logger.error('ERR: Failed to parse JSON from message')
+                self.__logger.error('Input JSON string:')
+                self.__logger.error(json_str)
+                self.__logger.error('Input log string:')
+                self.__logger.error(event['message'])
+                self.__logger.error(event)
+                self.__logger.error(err)
+                self.__logger.error(traceback.format_exc())
+                self.__logger.error('-----')
+
+    def search(self, find, after=None):
         """
         search will iterate over the log entries searching for lines that match the values in find.
         find is required.
 
-        :param find: dict representing the log entries to find.
-        :return: dict of the log entries.
-        """
-        for x in range(len(self.__events)):
-            self.parse_json(index=x)
-            if not self.is_subset(find, self.__events[x]):
-                # Event doesn't match search. Mark it for removal.
-                self.__events[x] = None
-        # Remove events marked for removal.
-        self.__events = [x for x in self.__events if x is not None]
-        return self.__events
+        The top-level values in find, e.g. 'priority' and 'method_name', are compared first, over all the log entries
+        at once with NumPy if it is installed. The JSON is only extracted from the message of the log entries that
+        match them.
+
+        With window=True, the log entries that don't match stay in the window.
+
+        :param find: dict representing the log entries to find, or a CompiledQuery returned by compile_query().
+        :param after: datetime.timedelta to only search the log entries of the last 'after' in the window. Only used
+            with window=True. Defaults to the whole window.
+        :return: list of Event log entries. Use Event.to_dict() to get a dict.
+        """
+        query = compile_query(find)
+        if self.__window:
+            self.__evict()
+            start = None
+            if after is not None:
+                start = TimestampDecoder.to_epoch(self.__now - after)
+            return [event for event in self.__events.search(query.find, start) if self.__match(query, event)]
+
+        # Remove the events that don't match the search.
+        self.__events = self.__events.select(
+            x for x in self.__events.indices(query.find) if self.__match(query, self.__events[x]))
+        return list(self.__events)
+
+    def stream(self, find):
+        """
+        stream is the streaming version of load() followed by search(). The log entries are read, filtered and
+        yielded one at a time without being stored, so memory does not grow with the size of the 'after' window.
+
+        :param find: dict representing the log entries to find, or a CompiledQuery returned by compile_query().
+        :return: generator of dict log entries
+        """
+        query = compile_query(find)
+        for event in self.iter_events():
+            if self.__match(query, event):
+                yield event
+
+    def follow(self, find=None, log_file='log.txt', interval=0.25, max_interval=5.0):
+        """
+        follow is a generator that yields the log entries as they are appended to the log file, like 'tail -F'. The
+        log file is kept open and polled for new lines. When there is nothing new, the time between polls doubles up
+        to max_interval, so an idle log costs little. Rotation is detected when the path points to a new inode or the
+        file shrinks; the rest of the old file is read before the new file is opened and read from the start.
+
+        A log entry is yielded when the next log entry starts or when the log file is idle for a poll, because until
+        then more lines may belong to it. The generator never ends; stop iterating to stop following.
+
+        :param find: dict representing the log entries to find, or a CompiledQuery returned by compile_query().
+            Defaults to all the log entries.
+        :param log_file: string filename of the log file that is written to, in the log path
+        :param interval: float seconds between polls when the log file is busy
+        :param max_interval: float maximum seconds between polls when the log file is idle
+        :return: generator of dict log entries
+        """
+        query = None if find is None else compile_query(find)
+        log_path = os.path.join(self.__log_path, log_file)
+        # Read block size.
+        block_size = 1024 * 1024
+
+        fh = None
+        inode = None
+        # The log file is read from the end when following starts and from the start after a rotation.
+        from_start = False
+        position = 0
+        partial = b''
+        event = None
+        delay = interval
+        try:
+            while True:
+                if fh is None:
+                    try:
+                        fh = open(log_path, mode='rb')
+                    except FileNotFoundError:
+                        # Between the rotation and the creation of the new log file.
+                        time.sleep(delay)
+                        delay = min(delay * 2, max_interval)
+                        from_start = True
+                        continue
+                    inode = os.fstat(fh.fileno()).st_ino
+                    position = 0 if from_start else fh.seek(0, os.SEEK_END)
+                    self.__logger.debug(f'Following log file: {log_path} from byte {position}')
+
+                data = fh.read(block_size)
+                if data:
+                    self.__advance_now()
+                    lines = (partial + data).split(b'\n')
+                    # The last line is still being written.
+                    partial = lines.pop()
+                    for raw_line in lines:
+                        line = self.__decode_line(raw_line, position, errors='replace')
+                        position += len(raw_line) + 1
+                        ts_match = self.__re_log_entry.match(line)
+                        if ts_match:
+                            # New log entry
+                            if event is not None and (query is None or self.__match(query, event)):
+                                yield event
+                            event = self.__new_event(ts_match)
+                        elif event is not None:
+                            # Multiline log entry; append to last line
+                            event['message'] += line.strip()
+                    delay = interval
+                    continue
+
+                if event is not None:
+                    # The log file is idle.
+                    if query is None or self.__match(query, event):
+                        yield event
+                    event = None
+
+                try:
+                    stat = os.stat(log_path)
+                except FileNotFoundError:
+                    stat = None
+                if stat is None or stat.st_ino != inode or stat.st_size < position + len(partial):
+                    # The log file was rotated or truncated. The old file was read to the end above.
+                    self.__logger.debug(f'Log file was rotated: {log_path}')
+                    fh.close()
+                    fh = None
+                    from_start = True
+                    position = 0
+                    partial = b''
+                    continue
+
+                time.sleep(delay)
+                delay = min(delay * 2, max_interval)
+        finally:
+            if fh is not None:
+                fh.close()
+
+    def search_many(self, queries, events=None):
+        """
+        search_many will search the log entries for several queries in a single pass. Unlike search(), the loaded log
+        entries are not changed, so they can be searched again without loading the logs again. The JSON is extracted
+        at most once per log entry and shared by all the queries.
+
+        :param queries: dict of name: dict representing the log entries to find, or a CompiledQuery
+        :param events: iterable of log entries to search, e.g. iter_events(). Defaults to the loaded log entries.
+        :return: dict of name: list of the log entries that match
+        """
+        compiled = [(name, compile_query(find)) for name, find in queries.items()]
+        found = {name: [] for name, _ in compiled}
+        if events is None:
+            events = self.__events
+        for event in events:
+            parsed = False
+            for name, query in compiled:
+                if not query.top_level(event):
+                    continue
+                if query.key_paths is not None and not query.key_paths(event['message']):
+                    continue
+                if not parsed:
+                    self.__parse_dict_json(event)
+                    parsed = True
+                if query.json is None or query.json(event):
+                    found[name].append(event)
+        return found
+
+    def __match(self, query, event):
+        """
+        __match will check if the log entry matches the query. The JSON is extracted from the message if the
+        top-level values match and the message has the keys of the JSON.
+
+        :param query: CompiledQuery
+        :param event: dict log entry
+        :return: true if the log entry matches
+        """
+        if not query.top_level(event):
+            return False
+        if query.key_paths is not None and not query.key_paths(event['message']):
+            return False
+        self.__parse_dict_json(event)
+        return query.json is None or query.json(event)
+
+    def __parse_dict_json(self, event):
+        """
+        __parse_dict_json will extract the JSON of a dict log entry, e.g. from iter_events(). The JSON of an Event log
+        entry is extracted by the store the first time it is read, and only once.
+
+        :param event: dict or Event log entry
+        :return: None
+        """
+        if not isinstance(event, Event):
+            self.__parse_event_json(event)
 
     def is_subset(self, subset, superset):
         """